@@ -0,0 +1,374 @@
+"""Response caches.
+
+Entries are pre-serialized JSON bodies, so a hit skips the database, model
+validation and encoding altogether. Storage is pluggable: ``MemoryBackend``
+(TTL + LRU, the default) keeps entries in process, ``RedisBackend`` works with
+any client speaking the ``redis.asyncio`` API. On top of a backend,
+``ResponseCache`` adds single-flight loading (concurrent misses on one key
+share a single load), explicit invalidation and hit/miss counters.
+
+Every entry is stored with its ETag (see ``conditional``), so revalidating
+a cached response costs neither hashing nor serialization.
+
+``ArticleCache`` caches the article listing and detail bodies. Writes keep it
+fresh: new articles drop the listings, like and comment counters are patched
+into the cached bodies in place. The listing-to-article index used for
+patching lives in each worker, so with a shared backend entries filled by
+another worker are only refreshed by their TTL. It is bounded like a memory
+backend (same TTL and number of entries), as it cannot see what the backend
+evicts.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+import orjson
+
+from conditional import CachedBody, article_etag, content_etag
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+REFERENCE_CACHE_TTL = float(os.environ.get("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.environ.get("REFERENCE_CACHE_SIZE", "64"))
+ARTICLE_CACHE_TTL = float(os.environ.get("ARTICLE_CACHE_TTL", "30"))
+ARTICLE_CACHE_SIZE = int(os.environ.get("ARTICLE_CACHE_SIZE", "2048"))
+
+
+class CacheBackend:
+    """Storage interface for serialized bodies"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def clear(self, prefix: str = ""):
+        """Delete every key starting with ``prefix``"""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-process storage with per-entry TTL and LRU eviction"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self, prefix: str = ""):
+        if not prefix:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+
+class RedisBackend(CacheBackend):
+    """Storage in Redis or any server speaking its protocol"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return cls(redis.asyncio.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self, prefix: str = ""):
+        keys = [key async for key in self.client.scan_iter(match=f"{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+def make_backend(max_entries: int) -> CacheBackend:
+    """Build the backend selected by ``CACHE_BACKEND``"""
+    if CACHE_BACKEND == "redis":
+        return RedisBackend.from_url(CACHE_REDIS_URL)
+    if CACHE_BACKEND != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    return MemoryBackend(max_entries)
+
+
+class ResponseCache:
+    """Namespaced cache of serialized bodies with single-flight loading"""
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Bumped by every invalidation, see get_or_load
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.last_modified = _now()
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        value = await self.backend.get(self._key(key))
+        if value is None:
+            return None
+        etag, body = value.split(b"\n", 1)
+        return CachedBody(body, etag.decode())
+
+    async def set(self, key: str, entry: CachedBody):
+        await self.backend.set(self._key(key), entry.etag.encode() + b"\n" + entry.body, self.ttl)
+
+    async def get_or_load(self, key: str,
+                          loader: Callable[[], Awaitable[Union[bytes, CachedBody]]]) -> CachedBody:
+        """Return the cached entry or load it, once, for all concurrent callers
+
+        ``loader`` returns the body, hashed into an ETag, or a ``CachedBody``
+        carrying its own version ETag.
+        """
+        entry = await self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        loading = self._loading.get(key)
+        if loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                # The loading request went away, not this one: load again
+                if loading.cancelled():
+                    return await self.get_or_load(key, loader)
+                raise
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[key] = loading
+        mark = self._write_mark()
+        try:
+            entry = await loader()
+            if not isinstance(entry, CachedBody):
+                entry = CachedBody(entry, content_etag(entry))
+            # A body loaded across a write to its content may be stale
+            if self._is_current(key, mark):
+                await self.set(key, entry)
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as exc:
+            loading.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting
+            loading.exception()
+            raise
+        else:
+            loading.set_result(entry)
+            return entry
+        finally:
+            del self._loading[key]
+
+    def _write_mark(self):
+        """State of the writes when a load starts, see ``_is_current``"""
+        return self._writes
+
+    def _is_current(self, key: str, mark) -> bool:
+        """Whether a body loaded since ``mark`` may be cached"""
+        return mark == self._writes
+
+    async def invalidate(self, key: Optional[str] = None):
+        """Drop one entry, or every entry of this cache when no key is given"""
+        self._writes += 1
+        self.last_modified = _now()
+        if key is None:
+            await self.backend.clear(self._key(""))
+        else:
+            await self.backend.delete(self._key(key))
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ArticleCache(ResponseCache):
+    """Article listing and detail bodies, kept fresh by the write endpoints"""
+
+    # Listings whose order depends on a counter are evicted, not patched
+    SORTED_BY = {"likes": {"popular", "trending"}, "comment_count": {"comments", "trending"}}
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float, max_listings: int):
+        super().__init__(name, backend, ttl)
+        self.max_listings = max_listings
+        # listing key -> (expiry, sort, article ids), oldest first
+        self._tracked: "OrderedDict[str, Tuple[float, str, Tuple[str, ...]]]" = OrderedDict()
+        # article id -> {listing key: sort} for the listings that contain it
+        self._listings: Dict[str, Dict[str, str]] = {}
+        # Patches made while loads were in flight: article id or evicted sort
+        # -> sequence number of its last patch, see _is_current
+        self._patch_seq = 0
+        self._patched_articles: Dict[str, int] = {}
+        self._patched_sorts: Dict[str, int] = {}
+        self.patches = 0
+
+    @staticmethod
+    def listing_key(**params) -> str:
+        """Normalized listing key, ``None`` values left out"""
+        return "list:" + urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+
+    # Representations of the article detail, each cached under its own key
+    DETAIL_FORMATS = ("markdown", "html")
+
+    @staticmethod
+    def detail_key(article_id: str, format: str = "markdown") -> str:
+        return f"article:{article_id}" if format == "markdown" else f"article:{article_id}:{format}"
+
+    @staticmethod
+    def article_id_of(detail_key: str) -> str:
+        return detail_key.split(":")[1]
+
+    def track_listing(self, key: str, sort: str, article_ids: Iterable[str]):
+        """Remember which articles a cached listing contains, for as long as it may be cached"""
+        self._untrack(key)
+        article_ids = tuple(article_ids)
+        self._tracked[key] = (time.monotonic() + self.ttl, sort, article_ids)
+        for article_id in article_ids:
+            self._listings.setdefault(article_id, {})[key] = sort
+        # Every entry has the same TTL, so the oldest expires first
+        now = time.monotonic()
+        while self._tracked and (len(self._tracked) > self.max_listings
+                                 or next(iter(self._tracked.values()))[0] < now):
+            self._untrack(next(iter(self._tracked)))
+
+    def _untrack(self, key: str):
+        entry = self._tracked.pop(key, None)
+        if entry is None:
+            return
+        for article_id in entry[2]:
+            listings = self._listings.get(article_id)
+            if listings is not None:
+                listings.pop(key, None)
+                if not listings:
+                    del self._listings[article_id]
+
+    async def invalidate_listings(self):
+        """Drop every cached listing, called when articles are added"""
+        self._writes += 1
+        self._tracked.clear()
+        self._listings.clear()
+        await self.backend.clear(self._key("list:"))
+
+    def _write_mark(self):
+        return self._writes, self._patch_seq
+
+    def _is_current(self, key: str, mark) -> bool:
+        """Drop a load across an invalidation, or across a patch of an article it shows
+
+        Counters change all the time, so a load is only dropped when the
+        patched article is in its body, or when it is a listing ordered by
+        the patched counter.
+        """
+        writes, seq = mark
+        if writes != self._writes:
+            return False
+        if seq == self._patch_seq:
+            return True
+        if not key.startswith("list:"):
+            return self._patched_articles.get(self.article_id_of(key), 0) <= seq
+        tracked = self._tracked.get(key)
+        if tracked is None:
+            return False
+        _, sort, article_ids = tracked
+        return (self._patched_sorts.get(sort, 0) <= seq
+                and all(self._patched_articles.get(article_id, 0) <= seq for article_id in article_ids))
+
+    async def patch(self, article_id: str, **fields):
+        """Write new counter values into every cached body showing the article"""
+        self.patches += 1
+        evicted_sorts = set().union(*(self.SORTED_BY.get(field, ()) for field in fields))
+        if self._loading:
+            self._patch_seq += 1
+            self._patched_articles[article_id] = self._patch_seq
+            for sort in evicted_sorts:
+                self._patched_sorts[sort] = self._patch_seq
+        else:
+            # No load can have started before an earlier patch
+            self._patched_articles.clear()
+            self._patched_sorts.clear()
+
+        for format in self.DETAIL_FORMATS:
+            detail_key = self.detail_key(article_id, format)
+            entry = await self.get(detail_key)
+            if entry is not None:
+                article = orjson.loads(entry.body)
+                article.update(fields)
+                await self.set(detail_key, CachedBody(_dump(article), article_etag(article)))
+
+        listings = self._listings.get(article_id, {})
+        for key, sort in list(listings.items()):
+            entry = await self.get(key) if sort not in evicted_sorts else None
+            if entry is None:
+                await self.backend.delete(self._key(key))
+                self._untrack(key)
+                continue
+            listing = orjson.loads(entry.body)
+            for article in listing["articles"]:
+                if article["id"] == article_id:
+                    article.update(fields)
+            body = _dump(listing)
+            await self.set(key, CachedBody(body, content_etag(body)))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "patches": self.patches}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _dump(data) -> bytes:
+    return orjson.dumps(data)
+
+
+# Reference data written by seed_database: CIEL info and formations
+reference_cache = ResponseCache("reference", make_backend(REFERENCE_CACHE_SIZE), REFERENCE_CACHE_TTL)
+
+# Article listings and details
+article_cache = ArticleCache("articles", make_backend(ARTICLE_CACHE_SIZE), ARTICLE_CACHE_TTL, ARTICLE_CACHE_SIZE)
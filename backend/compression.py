@@ -0,0 +1,181 @@
+"""Negotiated response compression.
+
+``CompressionMiddleware`` compresses complete JSON and text bodies of at
+least ``COMPRESSION_MIN_SIZE`` bytes with the best encoding the client
+accepts: brotli when the ``brotli`` package is installed, else gzip.
+Streamed responses (exports, NDJSON and SSE comment streams, events) are
+passed through untouched, so they keep flowing chunk by chunk; exports do
+their own gzip.
+
+Most API bodies come out of the response caches with an ETag, and the same
+bytes are served over and over. Compressed bodies are therefore kept in an
+LRU keyed by URL, ETag and encoding, so a cached response is compressed once
+per encoding instead of once per request. Compressing turns a strong ETag
+into a weak one, as the compressed bytes differ from the identity body;
+conditional requests compare ETags weakly, so 304s keep working.
+"""
+import gzip
+import importlib.util
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+# Brotli above 6 costs a lot more CPU for a few percent
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", "1024"))
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+if importlib.util.find_spec("brotli") is not None:
+    import brotli
+else:
+    brotli = None
+    logger.info("Brotli compression disabled, brotli is not installed")
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+# Supported encodings, most preferred first
+ENCODERS = {"gzip": _compress_gzip}
+if brotli is not None:
+    ENCODERS = {"br": _compress_brotli, **ENCODERS}
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, if any"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for name in ENCODERS:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class CompressedCache:
+    """Compressed bodies of ETagged responses, LRU by number of entries"""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compress(self, key: Tuple[str, str, str], body: bytes) -> bytes:
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return compressed
+        self.misses += 1
+        compressed = ENCODERS[key[-1]](body)
+        self._entries[key] = compressed
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return compressed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete, large enough bodies"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache: Optional[CompressedCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else compressed_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk tells whether the response streams
+                start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body", False) or not self._should_compress(headers, body):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            etag = headers.get("etag")
+            if etag is not None:
+                url = scope["path"] + "?" + scope.get("query_string", b"").decode("latin-1")
+                compressed = self.cache.get_or_compress((url, etag, encoding), body)
+                if not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+            else:
+                compressed = ENCODERS[encoding](body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+
+compressed_cache = CompressedCache()
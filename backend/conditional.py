@@ -0,0 +1,108 @@
+"""HTTP validators for conditional GETs.
+
+Cached bodies carry an ETag computed when they are stored: a content hash by
+default, or a version tag built from a few version fields when a route can
+rebuild that tag from a light projection. The article detail tag uses
+``likes``, ``comment_count`` and ``updated_at`` and the comment thread tag
+uses the ``id``/``likes`` pairs of its comments, so a revalidation answered
+with 304 never fetches the full documents.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, NamedTuple, Optional, Union
+
+from fastapi import Request, Response
+
+# Cache-Control policy per kind of route
+CACHE_CONTROL = {
+    # Seeded once, may be reused for a few minutes without revalidation
+    "reference": "public, max-age=300",
+    # Counters change constantly: always revalidate, 304 keeps it cheap
+    "article": "public, no-cache",
+    "listing": "public, no-cache",
+    "comments": "public, no-cache",
+}
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag from the body bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def version_etag(*parts) -> str:
+    """Weak ETag from version fields"""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12)
+    return 'W/"' + digest.hexdigest() + '"'
+
+
+def _timestamp_ms(value: Union[datetime, str]) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def article_etag(article: dict) -> str:
+    """Version tag of an article, from its stored or serialized form"""
+    return version_etag(article["likes"], article["comment_count"], _timestamp_ms(article["updated_at"]))
+
+
+def comments_etag(comments: Iterable[dict]) -> str:
+    """Version tag of a comment thread: comment bodies never change, likes do"""
+    return version_etag(*(f"{comment['id']}:{comment['likes']}" for comment in comments))
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for GET
+        return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _validator_headers(etag: str, policy: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[policy]}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified(etag: str, policy: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=_validator_headers(etag, policy, last_modified))
+
+
+def conditional_response(request: Request, entry: CachedBody, policy: str,
+                         last_modified: Optional[datetime] = None) -> Response:
+    """200 with validators, or 304 without a body when the client copy is current"""
+    if is_not_modified(request, entry.etag, last_modified):
+        return not_modified(entry.etag, policy, last_modified)
+    return Response(
+        content=entry.body,
+        media_type="application/json",
+        headers=_validator_headers(entry.etag, policy, last_modified)
+    )
@@ -0,0 +1,273 @@
+"""Like counters for articles and comments.
+
+``DirectCounter`` increments and reads back the new value in one
+``find_one_and_update`` round trip. ``CoalescingCounter`` holds increments for
+a few milliseconds and applies every increment of the window with a single
+``bulk_write``, which keeps a burst of likes on one document down to a couple
+of database operations. ``BufferedCounter`` is write-behind: it answers from
+memory and flushes aggregated deltas every ``LIKE_FLUSH_INTERVAL_MS`` or
+``LIKE_FLUSH_MAX_OPS`` increments, so a viral document costs one write per
+flush instead of one per like.
+
+The mode is chosen with ``LIKE_COUNTER_MODE`` (``direct``, ``coalesce`` or
+``buffer``). Fields listed in ``carried`` (e.g. a comment's ``article_id``)
+come back with the new value from ``increment_document``, without another
+read.
+"""
+import asyncio
+import logging
+import os
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+LIKE_COUNTER_MODE = os.environ.get("LIKE_COUNTER_MODE", "direct")
+LIKE_COALESCE_WINDOW_MS = float(os.environ.get("LIKE_COALESCE_WINDOW_MS", "5"))
+LIKE_FLUSH_INTERVAL_MS = float(os.environ.get("LIKE_FLUSH_INTERVAL_MS", "250"))
+LIKE_FLUSH_MAX_OPS = int(os.environ.get("LIKE_FLUSH_MAX_OPS", "1000"))
+LIKE_BUFFER_SHARDS = int(os.environ.get("LIKE_BUFFER_SHARDS", "16"))
+
+
+class DirectCounter:
+    """Increment a counter field and return its new value in one round trip"""
+
+    def __init__(self, collection, field: str = "likes", carried: Tuple[str, ...] = ()):
+        self.collection = collection
+        self.field = field
+        self.carried = tuple(carried)
+        self._projection = {"_id": 0, field: 1, **dict.fromkeys(self.carried, 1)}
+
+    async def increment(self, doc_id: str) -> Optional[int]:
+        """Return the new value, or None if the document does not exist"""
+        document = await self.increment_document(doc_id)
+        return document[self.field] if document else None
+
+    async def increment_document(self, doc_id: str) -> Optional[dict]:
+        """Like ``increment``, with the ``carried`` fields next to the new value"""
+        return await self.collection.find_one_and_update(
+            {"id": doc_id},
+            {"$inc": {self.field: 1}},
+            projection=self._projection,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def pending(self, doc_id: str) -> int:
+        """Increments accepted but not yet visible in the database"""
+        return 0
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class CoalescingCounter(DirectCounter):
+    """Batch the increments of a short window into one bulk_write
+
+    Each caller still gets a distinct value: the increments of one document
+    within a window are numbered in arrival order. The values are read back
+    after the write, so they may include increments made concurrently by
+    other workers.
+    """
+
+    def __init__(self, collection, field: str = "likes", carried: Tuple[str, ...] = (),
+                 window_ms: float = LIKE_COALESCE_WINDOW_MS):
+        super().__init__(collection, field, carried)
+        self.window = window_ms / 1000
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def increment_document(self, doc_id: str) -> Optional[dict]:
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(doc_id, []).append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await waiter
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        """Apply the pending increments and resolve their waiters"""
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        if not pending:
+            return
+
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({"id": doc_id}, {"$inc": {self.field: len(waiters)}})
+                 for doc_id, waiters in pending.items()],
+                ordered=False
+            )
+            documents = await self.collection.find(
+                {"id": {"$in": list(pending)}},
+                {**self._projection, "id": 1}
+            ).to_list(None)
+        except Exception as exc:
+            logger.exception("Failed to flush %s increments", self.collection.name)
+            for waiters in pending.values():
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+            return
+
+        by_id = {document.pop("id"): document for document in documents}
+        for doc_id, waiters in pending.items():
+            document = by_id.get(doc_id)
+            for position, waiter in enumerate(waiters, start=1 - len(waiters)):
+                if not waiter.done():
+                    waiter.set_result(None if document is None
+                                      else {**document, self.field: document[self.field] + position})
+
+    async def close(self):
+        """Flush whatever is still pending"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+
+class BufferedCounter(DirectCounter):
+    """Write-behind counter flushing aggregated deltas with bulk_write
+
+    Deltas are spread over shards by document id; a flush swaps out one shard
+    at a time, so increments keep landing in fresh shards while a write is in
+    flight. The value returned to a caller is the last value read back from
+    the database plus the deltas not written yet, and readers merge the same
+    deltas with ``pending`` to read their own writes. Values read back are
+    only kept for documents liked since the previous flush, so quiet
+    documents are re-read instead of being served from a stale base.
+    """
+
+    def __init__(self, collection, field: str = "likes", carried: Tuple[str, ...] = (),
+                 interval_ms: float = LIKE_FLUSH_INTERVAL_MS,
+                 max_ops: int = LIKE_FLUSH_MAX_OPS,
+                 shards: int = LIKE_BUFFER_SHARDS):
+        super().__init__(collection, field, carried)
+        self.interval = interval_ms / 1000
+        self.max_ops = max_ops
+        self._shards: List[Dict[str, int]] = [{} for _ in range(shards)]
+        self._in_flight: Dict[str, int] = {}
+        self._persisted: Dict[str, int] = {}
+        # Carried fields of the documents in _persisted
+        self._carried_values: Dict[str, dict] = {}
+        self._ops = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Flushes started by increment, referenced until done
+        self._eager_flushes: Set[asyncio.Task] = set()
+
+    def _shard(self, doc_id: str) -> int:
+        return zlib.crc32(doc_id.encode()) % len(self._shards)
+
+    def pending(self, doc_id: str) -> int:
+        return self._shards[self._shard(doc_id)].get(doc_id, 0) + self._in_flight.get(doc_id, 0)
+
+    async def increment_document(self, doc_id: str) -> Optional[dict]:
+        base = self._persisted.get(doc_id)
+        if base is None:
+            # Also the existence check: unknown ids are never buffered
+            document = await self.collection.find_one({"id": doc_id}, self._projection)
+            if document is None:
+                return None
+            base = self._persisted.setdefault(doc_id, document.pop(self.field))
+            self._carried_values.setdefault(doc_id, document)
+
+        shard = self._shards[self._shard(doc_id)]
+        shard[doc_id] = shard.get(doc_id, 0) + 1
+        self._ops += 1
+        if self._ops >= self.max_ops and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._eager_flushes.add(task)
+            task.add_done_callback(self._eager_flush_done)
+        return {**self._carried_values.get(doc_id, {}), self.field: base + self.pending(doc_id)}
+
+    def _eager_flush_done(self, task: asyncio.Task):
+        self._eager_flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # The deltas stay buffered for the next flush, as in _flush_periodically
+            logger.error("Failed to flush buffered %s increments", self.collection.name,
+                         exc_info=task.exception())
+
+    def start(self):
+        """Start the periodic flush"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered %s increments", self.collection.name)
+
+    async def flush(self):
+        """Write every buffered delta, one bulk_write per non-empty shard"""
+        async with self._flush_lock:
+            self._ops = 0
+            flushed = set()
+            for index, deltas in enumerate(self._shards):
+                if not deltas:
+                    continue
+                self._shards[index] = {}
+                self._in_flight = deltas
+                try:
+                    await self.collection.bulk_write(
+                        [UpdateOne({"id": doc_id}, {"$inc": {self.field: delta}})
+                         for doc_id, delta in deltas.items()],
+                        ordered=False
+                    )
+                except Exception:
+                    # Keep the deltas for the next flush
+                    shard = self._shards[index]
+                    for doc_id, delta in deltas.items():
+                        shard[doc_id] = shard.get(doc_id, 0) + delta
+                    raise
+                finally:
+                    self._in_flight = {}
+                for doc_id, delta in deltas.items():
+                    self._persisted[doc_id] = self._persisted.get(doc_id, 0) + delta
+                flushed.update(deltas)
+
+                # Pick up increments made by other workers as well
+                documents = await self.collection.find(
+                    {"id": {"$in": list(deltas)}},
+                    {**self._projection, "id": 1}
+                ).to_list(None)
+                for document in documents:
+                    doc_id = document.pop("id")
+                    self._persisted[doc_id] = document.pop(self.field)
+                    self._carried_values[doc_id] = document
+
+            self._persisted = {
+                doc_id: value for doc_id, value in self._persisted.items()
+                if doc_id in flushed or self.pending(doc_id)
+            }
+            self._carried_values = {
+                doc_id: values for doc_id, values in self._carried_values.items() if doc_id in self._persisted
+            }
+
+    async def close(self):
+        """Stop the periodic flush and drain the buffer"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await asyncio.gather(*self._eager_flushes, return_exceptions=True)
+        await self.flush()
+
+
+def make_counter(collection, field: str = "likes", carried: Tuple[str, ...] = ()):
+    """Build the counter selected by ``LIKE_COUNTER_MODE``"""
+    if LIKE_COUNTER_MODE == "coalesce":
+        return CoalescingCounter(collection, field, carried)
+    if LIKE_COUNTER_MODE == "buffer":
+        return BufferedCounter(collection, field, carried)
+    if LIKE_COUNTER_MODE != "direct":
+        raise ValueError(f"Unknown LIKE_COUNTER_MODE: {LIKE_COUNTER_MODE}")
+    return DirectCounter(collection, field, carried)
@@ -0,0 +1,63 @@
+"""Cached totals for the articles listing.
+
+``count_documents`` is a second pass over the listing predicate, so exact
+totals are cached per category and reading time filter until ``create_article`` invalidates them.
+Search totals are not cached: the search index already knows them. The TTL
+bounds how long a worker can serve a total made stale by another worker.
+``max_read_time`` comes from the client, so the number of totals is bounded
+too, least recently used first out. A total counted across an invalidation
+is not cached, see ``generation``.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+COUNT_CACHE_TTL = float(os.environ.get("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_SIZE = int(os.environ.get("COUNT_CACHE_SIZE", "256"))
+
+
+# (category, max_read_time) filters of a listing
+CountKey = Tuple[Optional[str], Optional[int]]
+
+
+class CountCache:
+    """Exact article counts keyed by listing filters"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[CountKey, Tuple[float, int]]" = OrderedDict()
+        # Bumped by every invalidation
+        self.generation = 0
+
+    def get(self, category: Optional[str], max_read_time: Optional[int] = None) -> Optional[int]:
+        key = (category, max_read_time)
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+        expires_at, total = entry
+        if expires_at < time.monotonic():
+            del self._counts[key]
+            return None
+        self._counts.move_to_end(key)
+        return total
+
+    def set(self, category: Optional[str], max_read_time: Optional[int], total: int,
+            generation: Optional[int] = None):
+        """Cache a total, unless ``generation`` shows it was counted before an invalidation"""
+        if generation is not None and generation != self.generation:
+            return
+        key = (category, max_read_time)
+        self._counts[key] = (time.monotonic() + self.ttl, total)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+
+    def invalidate(self):
+        """Forget every cached total, called when articles are added"""
+        self.generation += 1
+        self._counts.clear()
+
+
+count_cache = CountCache()
@@ -1,10 +1,17 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import time
 from datetime import datetime
+from enum import Enum
 
-# Database connection
+from pymongo.read_preferences import Nearest, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from mongo import make_client
+from reading import reading_stats
+from render import render_article
+
+# Database connection, pool and timeouts configured in mongo.py
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = make_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Collections
@@ -12,6 +19,84 @@ articles_collection = db.articles
 comments_collection = db.comments
 ciel_info_collection = db.ciel_info
 formations_collection = db.formations
+events_collection = db.events
+trending_collection = db.trending
+facets_collection = db.facets
+
+# Read preference of the reads that tolerate replication lag; "primary" turns
+# replica routing off. Secondaries further behind than the staleness bound
+# (90 s minimum, -1 for none) are not used.
+READ_REPLICA_PREFERENCE = os.environ.get("READ_REPLICA_PREFERENCE", "secondaryPreferred")
+READ_MAX_STALENESS_S = int(os.environ.get("READ_MAX_STALENESS_S", "90"))
+# How long after this worker writes to a collection its lag-tolerant reads go
+# to the primary instead (see LocalWriteReads). Defaults to the staleness
+# bound: no secondary in use is further behind than that.
+READ_YOUR_WRITES_S = float(os.environ.get("READ_YOUR_WRITES_S", str(max(READ_MAX_STALENESS_S, 90))))
+
+_READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+class Consistency(Enum):
+    """What a read needs to see"""
+    # Every acknowledged write, e.g. a value read back right after writing it
+    STRONG = "strong"
+    # Writes may show up with a replication delay, secondaries can serve it
+    EVENTUAL = "eventual"
+
+def _replica_read_preference():
+    if READ_REPLICA_PREFERENCE not in _READ_PREFERENCES:
+        raise ValueError(f"Unknown READ_REPLICA_PREFERENCE: {READ_REPLICA_PREFERENCE}")
+    return _READ_PREFERENCES[READ_REPLICA_PREFERENCE](max_staleness=READ_MAX_STALENESS_S)
+
+_replica_handles = {}
+
+def read_collection(collection, consistency: Consistency):
+    """Handle on ``collection`` routed for reads with the given consistency"""
+    if consistency is Consistency.STRONG or READ_REPLICA_PREFERENCE == "primary":
+        return collection
+    handle = _replica_handles.get(collection.name)
+    if handle is None:
+        handle = _replica_handles[collection.name] = collection.with_options(
+            read_preference=_replica_read_preference()
+        )
+    return handle
+
+class LocalWriteReads:
+    """Eventual reads of a collection that still see this worker's own writes
+
+    Behaves like ``read_collection(collection, Consistency.EVENTUAL)`` until
+    ``wrote`` is called; reads then go to the primary for
+    ``READ_YOUR_WRITES_S`` seconds. A cache dropped after a write is thus
+    refilled with the new state, not with what a lagging secondary still
+    serves, which would be kept for the whole cache TTL.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._replica = read_collection(collection, Consistency.EVENTUAL)
+        self._primary_until = 0.0
+
+    def wrote(self):
+        """Record a write made by this worker"""
+        self._primary_until = time.monotonic() + READ_YOUR_WRITES_S
+
+    def __getattr__(self, name):
+        handle = self.collection if time.monotonic() < self._primary_until else self._replica
+        return getattr(handle, name)
+
+_transactions_supported = None
+
+async def transactions_supported() -> bool:
+    """Whether the deployment (replica set or sharded cluster) supports transactions"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
 
 async def seed_database():
     """Seed database with initial data"""
@@ -54,7 +139,6 @@ La clé reste la vigilance et l'adaptation constante de nos défenses.""",
             "published_at": datetime.fromisoformat("2025-01-15T10:00:00"),
             "category": "Menaces",
             "tags": ["Cybersécurité", "IA", "Ransomware", "IoT"],
-            "read_time": "5 min",
             "likes": 24,
             "comment_count": 3,
             "created_at": datetime.utcnow(),
@@ -93,7 +177,6 @@ Cette approche permet de réduire considérablement les risques de compromission
             "published_at": datetime.fromisoformat("2025-01-12T14:30:00"),
             "category": "Architecture",
             "tags": ["Zero Trust", "Réseaux", "Architecture", "Sécurité"],
-            "read_time": "7 min",
             "likes": 31,
             "comment_count": 2,
             "created_at": datetime.utcnow(),
@@ -141,13 +224,15 @@ Il est crucial de commencer la préparation dès maintenant pour éviter une obs
             "published_at": datetime.fromisoformat("2025-01-08T09:15:00"),
             "category": "Cryptographie",
             "tags": ["Quantique", "Cryptographie", "RSA", "Post-quantique"],
-            "read_time": "8 min",
             "likes": 19,
             "comment_count": 1,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
     ]
+    for article in mock_articles:
+        article.update(reading_stats(article["content"]))
+        article.update(render_article(article["content"]))
     
     await articles_collection.insert_many(mock_articles)
     
@@ -0,0 +1,197 @@
+"""Real-time article events.
+
+``EventHub`` fans events out to the SSE and WebSocket subscribers of an
+article, so open pages see new comments and likes without polling. Writes
+publish through a broker: ``LocalBroker`` delivers within the process, and
+``MongoBroker`` writes events to a collection that every worker follows with
+a change stream (replica set required), for deployments with several
+workers. Likes are not pushed one by one: the hub keeps the latest counter
+values of each article and publishes the ones that changed every
+``EVENTS_LIKE_INTERVAL_MS``.
+
+The broker is chosen with ``EVENTS_BROKER`` (``local`` or ``mongo``).
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "local")
+EVENTS_LIKE_INTERVAL_MS = float(os.environ.get("EVENTS_LIKE_INTERVAL_MS", "1000"))
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))
+
+
+class Subscription:
+    """Events of one article for one client"""
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.lagging = False
+
+    def deliver(self, event: dict):
+        if self.lagging:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind reconnects instead of slowing others
+            self.lagging = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[dict]:
+        """Next event, or None once the subscriber has fallen behind"""
+        return await self._queue.get()
+
+
+class LocalBroker:
+    """Deliver events to the subscribers of this process only"""
+
+    # Whether subscribers may exist outside this process
+    remote = False
+
+    async def start(self, deliver: Callable[[dict], None]):
+        self._deliver = deliver
+
+    async def publish(self, event: dict):
+        self._deliver(event)
+
+    async def close(self):
+        pass
+
+
+class MongoBroker:
+    """Fan events out to every worker through a collection and a change stream"""
+
+    remote = True
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[dict], None]):
+        self._task = asyncio.create_task(self._follow(deliver))
+
+    async def publish(self, event: dict):
+        await self.collection.insert_one({**event, "created_at": datetime.utcnow()})
+
+    async def _follow(self, deliver: Callable[[dict], None]):
+        resume_after = None
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": "insert"}}], resume_after=resume_after
+                ) as stream:
+                    async for change in stream:
+                        resume_after = change["_id"]
+                        event = change["fullDocument"]
+                        event.pop("_id", None)
+                        event.pop("created_at", None)
+                        deliver(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event change stream failed, reopening")
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class EventHub:
+    """Per-article subscriptions fed through a broker"""
+
+    def __init__(self, broker, like_interval_ms: float = EVENTS_LIKE_INTERVAL_MS,
+                 queue_size: int = EVENTS_QUEUE_SIZE):
+        self.broker = broker
+        self.like_interval = like_interval_ms / 1000
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        # article id -> counters changed since the last flush
+        self._likes: Dict[str, dict] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def listening(self) -> bool:
+        """Whether publishing can reach anyone, so writers can skip the work"""
+        return self.broker.remote or bool(self._subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self, article_id: str):
+        subscription = Subscription(self.queue_size)
+        self._subscribers.setdefault(article_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers[article_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[article_id]
+
+    def _dispatch(self, event: dict):
+        for subscription in self._subscribers.get(event["article_id"], ()):
+            subscription.deliver(event)
+
+    async def publish(self, event: dict):
+        if self.listening:
+            await self.broker.publish(event)
+
+    async def comment_created(self, comment: dict, comment_count: int):
+        await self.publish({
+            "type": "comment",
+            "article_id": comment["article_id"],
+            "comment": comment,
+            "comment_count": comment_count
+        })
+
+    def article_liked(self, article_id: str, likes: int):
+        if self.listening:
+            self._pending_likes(article_id)["likes"] = likes
+
+    def comment_liked(self, article_id: str, comment_id: str, likes: int):
+        if self.listening:
+            self._pending_likes(article_id)["comments"][comment_id] = likes
+
+    def _pending_likes(self, article_id: str) -> dict:
+        return self._likes.setdefault(article_id, {"type": "likes", "article_id": article_id, "comments": {}})
+
+    async def flush_likes(self):
+        """Publish one event per article with the counters that changed"""
+        pending, self._likes = self._likes, {}
+        for event in pending.values():
+            await self.publish(event)
+
+    async def _flush_likes_periodically(self):
+        while True:
+            await asyncio.sleep(self.like_interval)
+            try:
+                await self.flush_likes()
+            except Exception:
+                logger.exception("Failed to publish like events")
+
+    async def start(self):
+        await self.broker.start(self._dispatch)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_likes_periodically())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.broker.close()
+
+
+def make_broker(collection):
+    """Build the broker selected by ``EVENTS_BROKER``"""
+    if EVENTS_BROKER == "mongo":
+        return MongoBroker(collection)
+    if EVENTS_BROKER != "local":
+        raise ValueError(f"Unknown EVENTS_BROKER: {EVENTS_BROKER}")
+    return LocalBroker()
@@ -0,0 +1,55 @@
+"""Streaming NDJSON and Server-Sent Events responses.
+
+Documents are read from a Motor cursor one batch at a time and written out as
+they arrive, so memory use depends on the batch size and not on how many
+documents are sent. Exports can be gzip-compressed on the fly.
+"""
+import os
+import zlib
+from typing import Any, AsyncIterator, Callable, Optional
+
+import orjson
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+
+
+def ndjson_line(document: dict) -> bytes:
+    # orjson writes datetimes in ISO 8601 itself
+    return orjson.dumps(document) + b"\n"
+
+
+def sse_event(data: Any, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+    """One Server-Sent Events message carrying ``data`` as JSON"""
+    message = b""
+    if event_id is not None:
+        message += f"id: {event_id}\n".encode()
+    if event is not None:
+        message += f"event: {event}\n".encode()
+    return message + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def stream_batches(cursor, batch_size: int,
+                         encode: Callable[[dict], bytes] = ndjson_line) -> AsyncIterator[bytes]:
+    """One chunk of encoded documents per cursor batch"""
+    lines = []
+    try:
+        async for document in cursor.batch_size(batch_size):
+            lines.append(encode(document))
+            if len(lines) >= batch_size:
+                yield b"".join(lines)
+                lines = []
+        if lines:
+            yield b"".join(lines)
+    finally:
+        # Also release the server-side cursor when the client goes away
+        await cursor.close()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a stream of chunks into one gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
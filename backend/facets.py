@@ -0,0 +1,94 @@
+"""Category and tag counts for the listing filters.
+
+Counts over all articles are materialized in ``facets_collection``, one
+document per ``(facet, value)``, so the filter sidebar is a single read of a
+small collection. New articles ``$inc`` their category and tags, and
+``rebuild_facets`` recomputes everything with one ``$facet``/``$group``
+aggregation when the counters need repairing. Counts for a filtered set of
+articles (a search, a category) are computed on the fly with the same
+pipeline, restricted by a ``$match``.
+"""
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Facet name -> article field
+FACET_FIELDS = {"category": "category", "tag": "tags"}
+
+
+def _facet_pipeline(match: dict) -> List[dict]:
+    """Count every facet value of the matching articles in one pass"""
+    by_count = {"$sort": {"count": -1, "_id": 1}}
+    return [
+        {"$match": match},
+        # A tag repeated within an article counts once, as in record_articles
+        {"$project": {"_id": 0, "category": 1, "tags": {"$setUnion": [{"$ifNull": ["$tags", []]}]}}},
+        {"$facet": {
+            "category": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}, by_count],
+            "tag": [{"$unwind": "$tags"}, {"$group": {"_id": "$tags", "count": {"$sum": 1}}}, by_count],
+        }},
+    ]
+
+
+def _as_counts(groups: List[dict]) -> List[Dict]:
+    return [{"value": group["_id"], "count": group["count"]} for group in groups]
+
+
+def sorted_counts(counts: Dict[str, Counter]) -> Dict[str, List[Dict]]:
+    """Counts tallied in process, ordered like the aggregation's"""
+    return {
+        facet: [{"value": value, "count": n} for value, n in sorted(counts[facet].items(), key=lambda item: (-item[1], item[0]))]
+        for facet in FACET_FIELDS
+    }
+
+
+async def count_facets(articles_collection, match: dict) -> Dict[str, List[Dict]]:
+    """Facet counts of the articles matching ``match``"""
+    result = await articles_collection.aggregate(_facet_pipeline(match)).to_list(1)
+    return {facet: _as_counts(result[0][facet]) if result else [] for facet in FACET_FIELDS}
+
+
+async def load_facets(facets_collection) -> Dict[str, List[Dict]]:
+    """Materialized counts over all articles, most frequent first"""
+    counts = {facet: [] for facet in FACET_FIELDS}
+    async for document in facets_collection.find({}, {"_id": 0}).sort([("count", -1), ("value", 1)]):
+        counts[document["facet"]].append({"value": document["value"], "count": document["count"]})
+    return counts
+
+
+async def record_articles(facets_collection, articles: Iterable[dict]):
+    """Count new articles in the materialized facets"""
+    increments = Counter()
+    for article in articles:
+        for facet, field in FACET_FIELDS.items():
+            values = article[field] if field == "tags" else [article[field]]
+            for value in set(values):
+                increments[facet, value] += 1
+    if increments:
+        await facets_collection.bulk_write([
+            UpdateOne({"facet": facet, "value": value}, {"$inc": {"count": n}}, upsert=True)
+            for (facet, value), n in increments.items()
+        ], ordered=False)
+
+
+async def rebuild_facets(articles_collection, facets_collection):
+    """Recompute the materialized facets from the articles
+
+    Values no article uses anymore are removed. Articles created while the
+    job runs can be counted twice or missed, so run it when traffic is low.
+    """
+    counts = await count_facets(articles_collection, {})
+    requests = []
+    for facet, values in counts.items():
+        requests.extend(
+            ReplaceOne({"facet": facet, "value": entry["value"]},
+                       {"facet": facet, "value": entry["value"], "count": entry["count"]}, upsert=True)
+            for entry in values
+        )
+        requests.append(DeleteMany({"facet": facet, "value": {"$nin": [entry["value"] for entry in values]}}))
+    await facets_collection.bulk_write(requests, ordered=True)
+    logger.info("Facets rebuilt: %s", ", ".join(f"{len(values)} {facet} values" for facet, values in counts.items()))
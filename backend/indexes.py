@@ -0,0 +1,209 @@
+"""Index management for the blog collections.
+
+Every query shape issued by ``server.py`` is declared here so that it can be
+served by an index. ``ensure_indexes`` creates the missing declared indexes at
+startup; ``manage.py ensure-indexes`` also rebuilds changed ones and drops
+undeclared ones, once per deployment rather than in every worker that boots.
+``verify_query_plans`` explains each endpoint query and fails if MongoDB would
+answer it with a collection scan.
+"""
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import (
+    articles_collection, comments_collection,
+    ciel_info_collection, formations_collection, events_collection, trending_collection,
+    facets_collection
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Declared indexes per collection, named so drift can be detected by name
+INDEX_SPECS = [
+    (articles_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("published_at", DESCENDING), ("id", DESCENDING)], name="recent"),
+        IndexModel([("likes", DESCENDING), ("id", DESCENDING)], name="popular"),
+        IndexModel([("comment_count", DESCENDING), ("id", DESCENDING)], name="comments"),
+        IndexModel([("category", ASCENDING), ("published_at", DESCENDING), ("id", DESCENDING)], name="category_recent"),
+        IndexModel([("category", ASCENDING), ("likes", DESCENDING), ("id", DESCENDING)], name="category_popular"),
+        IndexModel([("category", ASCENDING), ("comment_count", DESCENDING), ("id", DESCENDING)], name="category_comments"),
+        IndexModel([("reading_minutes", ASCENDING), ("id", ASCENDING)], name="read_time"),
+        IndexModel([("category", ASCENDING), ("reading_minutes", ASCENDING), ("id", ASCENDING)],
+                   name="category_read_time"),
+        IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated"),
+    ]),
+    (comments_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("article_id", ASCENDING), ("published_at", ASCENDING), ("id", ASCENDING)], name="article_thread"),
+        IndexModel([("published_at", ASCENDING), ("id", ASCENDING)], name="published"),
+    ]),
+    (ciel_info_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ]),
+    (formations_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("level", ASCENDING)], name="level_unique", unique=True),
+    ]),
+    # Materialized category and tag counts
+    (facets_collection, [
+        IndexModel([("facet", ASCENDING), ("value", ASCENDING)], name="facet_value_unique", unique=True),
+    ]),
+    # Trending score snapshot, read whole by each rebuild
+    (trending_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ]),
+    # Only written by the mongo event broker, read through a change stream
+    (events_collection, [
+        IndexModel([("created_at", ASCENDING)], name="expire", expireAfterSeconds=3600),
+    ]),
+]
+
+# Query shapes issued by the API: (label, collection, filter, sort)
+# Reference data reads with an empty filter (ciel-info, formations list) are
+# whole-collection reads of a handful of documents and are not listed here.
+QUERY_SHAPES = [
+    ("get_article", articles_collection, {"id": "1"}, None),
+    ("like_article", articles_collection, {"id": "1"}, None),
+    ("get_articles:recent", articles_collection, {}, [("published_at", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:popular", articles_collection, {}, [("likes", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:comments", articles_collection, {}, [("comment_count", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:category:recent", articles_collection, {"category": "Menaces"},
+     [("published_at", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:category:popular", articles_collection, {"category": "Menaces"},
+     [("likes", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:category:comments", articles_collection, {"category": "Menaces"},
+     [("comment_count", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:read_time", articles_collection, {}, [("reading_minutes", ASCENDING), ("id", ASCENDING)]),
+    ("get_articles:category:read_time", articles_collection, {"category": "Menaces"},
+     [("reading_minutes", ASCENDING), ("id", ASCENDING)]),
+    ("get_articles:max_read_time", articles_collection, {"reading_minutes": {"$lte": 5}},
+     [("reading_minutes", ASCENDING), ("id", ASCENDING)]),
+    ("get_articles:max_read_time:recent", articles_collection, {"reading_minutes": {"$lte": 5}},
+     [("published_at", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:cursor", articles_collection,
+     {"category": "Menaces", "likes": {"$lte": 10}, "$or": [{"likes": {"$lt": 10}}, {"id": {"$lt": "1"}}]},
+     [("likes", DESCENDING), ("id", DESCENDING)]),
+    ("get_articles:search", articles_collection, {"id": {"$in": ["1", "2"]}},
+     [("published_at", DESCENDING), ("id", DESCENDING)]),
+    ("backfill_reading_stats", articles_collection, {"reading_minutes": {"$exists": False}}, None),
+    ("search_index:sync", articles_collection, {"updated_at": {"$gte": datetime(2025, 1, 1)}}, None),
+    ("export_articles", articles_collection, {}, [("updated_at", ASCENDING), ("id", ASCENDING)]),
+    ("export_articles:since", articles_collection, {"updated_at": {"$gte": datetime(2025, 1, 1)}},
+     [("updated_at", ASCENDING), ("id", ASCENDING)]),
+    ("get_comments", comments_collection, {"article_id": "1"}, [("published_at", ASCENDING), ("id", ASCENDING)]),
+    ("get_comments:cursor", comments_collection,
+     {"article_id": "1", "published_at": {"$gte": datetime(2025, 1, 1)},
+      "$or": [{"published_at": {"$gt": datetime(2025, 1, 1)}}, {"id": {"$gt": "1"}}]},
+     [("published_at", ASCENDING), ("id", ASCENDING)]),
+    ("like_comment", comments_collection, {"id": "1"}, None),
+    ("export_comments", comments_collection, {}, [("published_at", ASCENDING), ("id", ASCENDING)]),
+    ("export_comments:since", comments_collection, {"published_at": {"$gte": datetime(2025, 1, 1)}},
+     [("published_at", ASCENDING), ("id", ASCENDING)]),
+    ("get_formation_by_level", formations_collection, {"level": "BTS"}, None),
+]
+
+
+# Options that change what an index does; v, ns, background and the like do not
+_INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+# Server errors when another process reconciles the same indexes meanwhile
+_INDEX_NOT_FOUND = 27
+_INDEX_CONFLICTS = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def _index_signature(index: dict):
+    """Keys and options of a declared (``IndexModel.document``) or live index"""
+    keys = index["key"]
+    if isinstance(keys, dict):
+        keys = keys.items()
+    options = {option: index[option] for option in _INDEX_OPTIONS if index.get(option) not in (None, False)}
+    return [tuple(key) for key in keys], options
+
+
+async def _drop_index(collection, name: str):
+    try:
+        await collection.drop_index(name)
+    except OperationFailure as exc:
+        if exc.code != _INDEX_NOT_FOUND:
+            raise
+
+
+async def _create_index(collection, model: IndexModel):
+    try:
+        await collection.create_indexes([model])
+    except OperationFailure as exc:
+        if exc.code not in _INDEX_CONFLICTS:
+            raise
+        logger.warning("Index %s.%s conflicts with an existing index, left as is: %s",
+                       collection.name, model.document["name"], exc)
+        return
+    logger.info("Created index %s.%s", collection.name, model.document["name"])
+
+
+async def ensure_indexes(rebuild: bool = False, drop_unknown: bool = False):
+    """Create missing indexes; rebuild changed ones and drop undeclared ones when asked
+
+    Without ``rebuild`` and ``drop_unknown``, live indexes are never touched,
+    so that workers booting together and indexes added by hand are safe.
+    """
+    for collection, models in INDEX_SPECS:
+        live = await collection.index_information()
+
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            current = live.pop(name, None)
+            if current is None:
+                await _create_index(collection, model)
+            elif _index_signature(current) != _index_signature(spec):
+                if not rebuild:
+                    logger.warning("Index %s.%s differs from its declaration, run manage.py ensure-indexes",
+                                   collection.name, name)
+                    continue
+                logger.info("Rebuilding index %s.%s (definition changed)", collection.name, name)
+                await _drop_index(collection, name)
+                await _create_index(collection, model)
+
+        # Whatever is left in ``live`` is not declared anymore
+        live.pop("_id_", None)
+        for name in live:
+            if drop_unknown:
+                logger.info("Dropping undeclared index %s.%s", collection.name, name)
+                await _drop_index(collection, name)
+            else:
+                logger.warning("Undeclared index %s.%s left in place", collection.name, name)
+
+
+def _plan_stages(plan):
+    """Yield every stage name of an explain plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def verify_query_plans():
+    """Explain every API query shape and raise if any winning plan is a COLLSCAN"""
+    offenders = []
+    for label, collection, query, sort in QUERY_SHAPES:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(1).explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(winning_plan)):
+            offenders.append(label)
+
+    if offenders:
+        raise RuntimeError(f"Collection scan in query plan for: {', '.join(offenders)}")
+    logger.info("Query plans verified for %d query shapes", len(QUERY_SHAPES))
+
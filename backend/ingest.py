@@ -0,0 +1,124 @@
+"""Bulk article ingestion.
+
+Items arrive as a JSON array or as NDJSON. NDJSON is parsed while the body
+streams in, so at most one chunk of documents is held in memory. Items are
+validated on a worker thread and written with unordered ``insert_many`` in
+chunks of ``BULK_CHUNK_SIZE``, and failures are reported per item (by position in the
+input) without stopping the rest of the batch. Articles are stored without
+their HTML rendering (see ``render``), which would bound the ingest rate:
+the first read of an article as HTML renders it, and ``manage.py
+render-articles`` renders the backlog in a process pool.
+"""
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import ArticleCreate, BulkIngestResponse, BulkItemError
+from reading import new_article
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "1000"))
+
+# (position in the input, parsed item, parse error)
+RawItem = Tuple[int, Any, Optional[str]]
+
+
+def iter_json_array(body: bytes) -> AsyncIterator[RawItem]:
+    """Items of a JSON array body; raises ValueError right away if it is not one"""
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array")
+
+    async def generate():
+        for index, item in enumerate(items):
+            yield index, item, None
+    return generate()
+
+
+async def iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[RawItem]:
+    """Items of an NDJSON body, parsed as the chunks arrive; blank lines are skipped"""
+    index = 0
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(index, line)
+                index += 1
+    if buffer.strip():
+        yield _parse_line(index, buffer)
+
+
+def _parse_line(index: int, line: bytes) -> RawItem:
+    try:
+        return index, json.loads(line), None
+    except ValueError as exc:
+        return index, None, f"Invalid JSON: {exc}"
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc'])) or 'item'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def _validate(raw_items: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, dict]], List[BulkItemError]]:
+    """Documents of the valid items and errors of the others, by position"""
+    documents, errors = [], []
+    for index, raw in raw_items:
+        try:
+            article = new_article(ArticleCreate.model_validate(raw))
+        except ValidationError as exc:
+            errors.append(BulkItemError(index=index, error=_validation_message(exc)))
+            continue
+        documents.append((index, article.model_dump()))
+    return documents, errors
+
+
+async def ingest_articles(items: AsyncIterator[RawItem], collection,
+                          on_created: Callable[[List[dict]], Awaitable[None]],
+                          chunk_size: int = BULK_CHUNK_SIZE) -> BulkIngestResponse:
+    """Validate and insert ``items``, calling ``on_created`` after each chunk"""
+    errors: List[BulkItemError] = []
+    inserted = 0
+    # (position, parsed item) pairs waiting to be validated and written
+    chunk: List[Tuple[int, Any]] = []
+
+    async def write_chunk():
+        nonlocal inserted
+        # Validating a whole chunk would hold the event loop for too long
+        valid, invalid = await asyncio.to_thread(_validate, chunk)
+        chunk.clear()
+        errors.extend(invalid)
+        if not valid:
+            return
+        documents = [document for _, document in valid]
+        failed = set()
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            for write_error in exc.details.get("writeErrors", []):
+                position = valid[write_error["index"]][0]
+                failed.add(write_error["index"])
+                errors.append(BulkItemError(index=position, error=write_error.get("errmsg", "Write failed")))
+        created = [document for offset, document in enumerate(documents) if offset not in failed]
+        inserted += len(created)
+        if created:
+            await on_created(created)
+
+    async for index, raw, parse_error in items:
+        if parse_error is not None:
+            errors.append(BulkItemError(index=index, error=parse_error))
+            continue
+        chunk.append((index, raw))
+        if len(chunk) >= chunk_size:
+            await write_chunk()
+    if chunk:
+        await write_chunk()
+
+    errors.sort(key=lambda error: error.index)
+    return BulkIngestResponse(inserted=inserted, failed=len(errors), errors=errors)
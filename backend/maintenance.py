@@ -0,0 +1,115 @@
+"""Repair and backfill jobs, run with ``manage.py``."""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from database import articles_collection, comments_collection
+from reading import reading_stats
+from render import RENDERED_FIELDS, is_rendered, render_batch
+
+logger = logging.getLogger(__name__)
+
+# Articles sent to a render worker at once
+RENDER_BATCH_SIZE = int(os.environ.get("RENDER_BATCH_SIZE", "50"))
+# Articles updated per bulk_write by backfill_reading_stats
+READING_BATCH_SIZE = 500
+
+
+async def reconcile_comment_counts():
+    """Recompute every ``comment_count`` from the comments collection
+
+    One aggregation counts the comments of each article through the
+    ``article_thread`` index and merges the articles whose counter drifted
+    back into ``articles_collection``. Requires MongoDB 5.0+ ($lookup with
+    both join fields and a sub-pipeline). Comments created while the job runs
+    can be missed by the recount, so run it when traffic is low.
+    """
+    await articles_collection.aggregate([
+        {"$project": {"_id": 0, "id": 1, "comment_count": 1}},
+        {"$lookup": {
+            "from": comments_collection.name,
+            "localField": "id",
+            "foreignField": "article_id",
+            "pipeline": [{"$count": "n"}],
+            "as": "counted"
+        }},
+        {"$project": {
+            "id": 1,
+            "previous": "$comment_count",
+            "comment_count": {"$ifNull": [{"$first": "$counted.n"}, 0]}
+        }},
+        {"$match": {"$expr": {"$ne": ["$comment_count", "$previous"]}}},
+        {"$project": {"id": 1, "comment_count": 1}},
+        {"$merge": {
+            "into": articles_collection.name,
+            "on": "id",
+            "whenMatched": "merge",
+            "whenNotMatched": "discard"
+        }}
+    ]).to_list(None)
+    logger.info("Comment counts reconciled")
+
+
+async def render_articles(workers: Optional[int] = None, force: bool = False):
+    """Render the articles whose stored HTML is missing or stale
+
+    Rendering is CPU-bound, so batches of ``RENDER_BATCH_SIZE`` articles are
+    spread over a pool of ``workers`` processes (one per CPU by default)
+    while this process keeps reading articles and writing results back.
+    Results are written only if the content did not change meanwhile.
+    """
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    rendered = 0
+
+    async def render(pool, batch: List[dict]) -> int:
+        results = await loop.run_in_executor(pool, render_batch, [article["content"] for article in batch])
+        result = await articles_collection.bulk_write([
+            UpdateOne({"id": article["id"], "content": article["content"]},
+                      {"$set": {field: fields[field] for field in RENDERED_FIELDS}})
+            for article, fields in zip(batch, results)
+        ], ordered=False)
+        return result.modified_count
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        batch: List[dict] = []
+        async for article in articles_collection.find({}, {"_id": 0, "id": 1, "content": 1, "content_hash": 1}):
+            if force or not is_rendered(article):
+                batch.append(article)
+            if len(batch) >= RENDER_BATCH_SIZE:
+                running.add(asyncio.ensure_future(render(pool, batch)))
+                batch = []
+            # Keep every worker busy without reading the whole collection ahead
+            if len(running) >= 2 * workers:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                rendered += sum(task.result() for task in done)
+        if batch:
+            running.add(asyncio.ensure_future(render(pool, batch)))
+        rendered += sum(await asyncio.gather(*running))
+    logger.info("Rendered %d articles with %d workers", rendered, workers)
+
+
+async def backfill_reading_stats(force: bool = False):
+    """Compute word count and reading time of the articles that have none
+
+    Word counting is vectorized and cheap, so this runs in process, in
+    batches of ``READING_BATCH_SIZE`` updates. ``force`` recomputes every
+    article, for instance after changing ``READING_WORDS_PER_MINUTE``.
+    """
+    query = {} if force else {"reading_minutes": {"$exists": False}}
+    updated = 0
+    batch = []
+    async for article in articles_collection.find(query, {"_id": 0, "id": 1, "content": 1}):
+        batch.append(UpdateOne({"id": article["id"]}, {"$set": reading_stats(article["content"])}))
+        if len(batch) >= READING_BATCH_SIZE:
+            updated += (await articles_collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await articles_collection.bulk_write(batch, ordered=False)).modified_count
+    if updated:
+        logger.info("Reading time computed for %d articles", updated)
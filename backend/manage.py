@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the blog database.
+
+Usage: python manage.py <command>
+"""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Load environment variables BEFORE importing local modules
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from database import articles_collection, facets_collection
+from facets import rebuild_facets
+from indexes import ensure_indexes, verify_query_plans
+from maintenance import backfill_reading_stats, reconcile_comment_counts, render_articles
+
+
+async def cmd_ensure_indexes(args):
+    """Reconcile the declared indexes with the live collections"""
+    await ensure_indexes(rebuild=True, drop_unknown=not args.keep_unknown)
+    await verify_query_plans()
+
+
+async def cmd_check_plans(args):
+    """Fail if any API query is answered with a collection scan"""
+    await verify_query_plans()
+
+
+async def cmd_reconcile_comment_counts(args):
+    """Recompute comment_count of every article from the comments"""
+    await reconcile_comment_counts()
+
+
+async def cmd_rebuild_facets(args):
+    """Recompute the category and tag counts from the articles"""
+    await rebuild_facets(articles_collection, facets_collection)
+
+
+async def cmd_render_articles(args):
+    """Render to HTML the articles whose stored rendering is missing or stale"""
+    await render_articles(workers=args.workers, force=args.force)
+
+
+async def cmd_backfill_reading_stats(args):
+    """Compute word count and reading time of the articles that have none"""
+    await backfill_reading_stats(force=args.force)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CIEL blog database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure-indexes", help=cmd_ensure_indexes.__doc__)
+    ensure.add_argument("--keep-unknown", action="store_true", help="do not drop undeclared indexes")
+    ensure.set_defaults(handler=cmd_ensure_indexes)
+
+    check = commands.add_parser("check-plans", help=cmd_check_plans.__doc__)
+    check.set_defaults(handler=cmd_check_plans)
+
+    reconcile = commands.add_parser("reconcile-comment-counts", help=cmd_reconcile_comment_counts.__doc__)
+    reconcile.set_defaults(handler=cmd_reconcile_comment_counts)
+
+    facets = commands.add_parser("rebuild-facets", help=cmd_rebuild_facets.__doc__)
+    facets.set_defaults(handler=cmd_rebuild_facets)
+
+    render = commands.add_parser("render-articles", help=cmd_render_articles.__doc__)
+    render.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    render.add_argument("--force", action="store_true", help="render every article again")
+    render.set_defaults(handler=cmd_render_articles)
+
+    reading = commands.add_parser("backfill-reading-stats", help=cmd_backfill_reading_stats.__doc__)
+    reading.add_argument("--force", action="store_true", help="recompute every article")
+    reading.set_defaults(handler=cmd_backfill_reading_stats)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 import uuid
 from datetime import datetime
@@ -13,20 +13,52 @@ class Article(BaseModel):
     published_at: datetime = Field(default_factory=datetime.utcnow)
     category: str
     tags: List[str]
-    read_time: str
+    read_time: str  # "5 min", from reading_minutes
+    word_count: int = 0
+    reading_minutes: int = 0
     likes: int = 0
     comment_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
-class ArticleCreate(BaseModel):
+class TocEntry(BaseModel):
+    """Heading of an article, with the anchor of its rendered HTML"""
+    level: int
+    id: str
+    name: str
+    children: List["TocEntry"] = []
+
+class ArticleHTML(Article):
+    """Article with its markdown rendered to sanitized HTML (``format=html``)"""
+    # Served without ``content``: the HTML replaces the markdown
+    content_html: str
+    toc: List[TocEntry] = []
+
+class ArticleSummary(BaseModel):
+    """Article as shown in listings, without the markdown body"""
+    # Fields requested with ``fields=`` are passed through as extras
+    model_config = ConfigDict(extra="allow")
+
+    id: str
     title: str
     excerpt: str
-    content: str
     author: str
+    published_at: datetime
     category: str
     tags: List[str]
     read_time: str
+    reading_minutes: int = 0
+    likes: int = 0
+    comment_count: int = 0
+
+class ArticleCreate(BaseModel):
+    """Reading time is computed from ``content``, and the excerpt when it is left out"""
+    title: str
+    excerpt: Optional[str] = None
+    content: str
+    author: str
+    category: str
+    tags: List[str]
 
 class Comment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -61,7 +93,27 @@ class Formation(BaseModel):
     program_highlights: List[str]
 
 class ArticlesResponse(BaseModel):
-    articles: List[Article]
-    total: int
+    articles: List[ArticleSummary]
+    total: Optional[int]  # None when the request asked for count=none
+    total_estimated: bool = False
     page: int
-    limit: int
\ No newline at end of file
+    limit: int
+    next_cursor: Optional[str] = None  # Opaque, pass back as ``cursor``
+
+class BulkItemError(BaseModel):
+    index: int  # Position of the item in the request body
+    error: str
+
+class BulkIngestResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkItemError]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class FacetsResponse(BaseModel):
+    categories: List[FacetCount]
+    tags: List[FacetCount]
+    total: int  # Articles counted
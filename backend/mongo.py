@@ -0,0 +1,180 @@
+"""MongoDB client configuration and lifecycle.
+
+Pool size, timeouts and wire compression come from the environment instead
+of driver defaults. The client reads from the primary; reads that tolerate
+replication lag are routed by ``database.READ_REPLICA_PREFERENCE``. ``warm_up`` opens the pool before
+the first request and ``close`` releases it at shutdown; both run from the
+FastAPI lifespan. ``PoolMetrics`` records how long operations wait to check
+out a connection, which is the number to watch when sizing workers against
+``MONGO_MAX_POOL_SIZE``.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+# 0 means no socket timeout, so long exports are not cut off
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "0"))
+# Compressors in order of preference; those whose package is missing are skipped.
+# zlib needs no package, so compression stays on whatever is installed
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_APP_NAME = os.environ.get("MONGO_APP_NAME", "ciel-blog")
+
+# Package providing each compressor, zlib is in the standard library
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+# Upper bounds, in milliseconds, of the checkout wait histogram
+WAIT_BUCKETS_MS = (1, 5, 25, 100, 500, 2500)
+
+
+def available_compressors(names: str) -> List[str]:
+    compressors = []
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        package = _COMPRESSOR_PACKAGES.get(name)
+        if package is None:
+            raise ValueError(f"Unknown compressor in MONGO_COMPRESSORS: {name}")
+        if importlib.util.find_spec(package) is None:
+            logger.info("MongoDB compressor %s skipped, %s is not installed", name, package)
+            continue
+        compressors.append(name)
+    if names.strip() and not compressors:
+        logger.warning("MongoDB wire compression is off, none of %s is installed", names)
+    return compressors
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout counts and wait times, per process
+
+    Motor runs each operation on a worker thread and a checkout starts and
+    ends on the same thread, so the start time is kept in a thread local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.failures = 0
+        self.checked_out = 0
+        self.connections = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def _record_wait(self, failed: bool):
+        started = getattr(self._local, "started", None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        self._local.started = None
+        with self._lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.checkouts += 1
+                self.checked_out += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            bucket = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if wait_ms < bound), len(WAIT_BUCKETS_MS))
+            self.wait_buckets[bucket] += 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._record_wait(failed=False)
+
+    def connection_check_out_failed(self, event):
+        self._record_wait(failed=True)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            attempts = self.checkouts + self.failures
+            labels = [f"<{bound}ms" for bound in WAIT_BUCKETS_MS] + [f">={WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "connections": self.connections,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "avg_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "wait_histogram": dict(zip(labels, self.wait_buckets)),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def client_options() -> Dict:
+    """Keyword arguments for the client, from the environment"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "appname": MONGO_APP_NAME,
+        "event_listeners": [pool_metrics],
+    }
+    compressors = available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def make_client(url: str) -> AsyncIOMotorClient:
+    # Motor connects lazily: nothing happens here until warm_up or a first query
+    return AsyncIOMotorClient(url, **client_options())
+
+
+async def warm_up(client: AsyncIOMotorClient):
+    """Check the server is reachable and open ``MONGO_MIN_POOL_SIZE`` connections"""
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+    logger.info("MongoDB connection pool warmed up, %d connections open", pool_metrics.snapshot()["connections"])
+
+
+def close(client: AsyncIOMotorClient):
+    client.close()
+    logger.info("MongoDB client closed")
@@ -0,0 +1,87 @@
+"""Opaque keyset cursors for paginated listings.
+
+A cursor records the sort key and ``id`` of the last item of a page. The next
+page is fetched with a range predicate on ``(sort key, id)`` instead of a
+``skip``, so it costs the same whatever its depth and does not shift when
+items before it change.
+"""
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Any, Callable, Dict, Tuple
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for another listing"""
+
+
+def _is_date(value: Any) -> bool:
+    return isinstance(value, datetime)
+
+
+def _is_count(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_trending_position(value: Any) -> bool:
+    # [ranking epoch, rank key], see TrendingIndex.page
+    return (
+        isinstance(value, list) and len(value) == 2
+        and all(_is_number(part) and math.isfinite(part) for part in value)
+    )
+
+
+# Type check of the sort value held by each kind of cursor, so that a forged
+# value is rejected here rather than failing when it is compared
+VALUE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "recent": _is_date,
+    "thread": _is_date,
+    "popular": _is_count,
+    "comments": _is_count,
+    "read_time": _is_count,
+    "relevance": _is_number,
+    "trending": _is_trending_position,
+}
+
+
+def encode_cursor(kind: str, value: Any, item_id: str) -> str:
+    """Build an opaque cursor pointing after ``(value, item_id)``"""
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = json.dumps([kind, value, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> Tuple[Any, str]:
+    """Return the ``(value, item_id)`` stored in a cursor issued for ``kind``"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_kind, value, item_id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["$date"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_kind != kind or not isinstance(item_id, str):
+        raise InvalidCursor(f"Cursor was not issued for sort={kind}")
+    check = VALUE_CHECKS.get(kind)
+    if check is not None and not check(value):
+        raise InvalidCursor("Malformed cursor")
+    return value, item_id
+
+
+def keyset_filter(field: str, direction: int, value: Any, item_id: str) -> dict:
+    """Match the items after ``(value, item_id)`` in a ``(field, id)`` sort
+
+    The plain range on ``field`` gives the index scan its bounds; the ``$or``
+    only discards the ties that were already returned.
+    """
+    op, bound = ("$lt", "$lte") if direction < 0 else ("$gt", "$gte")
+    return {
+        field: {bound: value},
+        "$or": [{field: {op: value}}, {"id": {op: item_id}}],
+    }
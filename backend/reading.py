@@ -0,0 +1,82 @@
+"""Reading statistics derived from the markdown content.
+
+Word count, reading time and, when the author did not write one, the excerpt
+are computed when an article is written, so they are consistent across
+articles and ``reading_minutes`` can be indexed for filtering and sorting.
+Words are counted on the UTF-8 bytes with NumPy: a byte lookup table marks
+word bytes (ASCII letters and digits, and every byte of a non-ASCII
+character, which in French text are accented letters) and each word is the
+start of a run of them. Markdown markup is punctuation and does not count.
+"""
+import math
+import os
+import re
+from typing import Dict
+
+import numpy as np
+
+from models import Article, ArticleCreate
+
+READING_WORDS_PER_MINUTE = int(os.environ.get("READING_WORDS_PER_MINUTE", "200"))
+EXCERPT_LENGTH = int(os.environ.get("EXCERPT_LENGTH", "200"))
+
+_WORD_BYTES = np.zeros(256, dtype=bool)
+for _start, _end in ((b"0", b"9"), (b"A", b"Z"), (b"a", b"z")):
+    _WORD_BYTES[ord(_start):ord(_end) + 1] = True
+_WORD_BYTES[0x80:] = True
+
+# Markdown stripped from the excerpt: images, links (keeping their text),
+# emphasis and inline code markers
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_INLINE_MARKUP_RE = re.compile(r"[*_`~]+")
+# Blocks that are not prose: headings, fences, quotes, lists, tables, rules, html
+_NON_PROSE_RE = re.compile(r"^\s*(#|```|~~~|>|[-*+] |\d+[.)] |\||---|\*\*\*|<)")
+
+
+def word_count(text: str) -> int:
+    is_word = _WORD_BYTES[np.frombuffer(text.encode(), dtype=np.uint8)]
+    if not len(is_word):
+        return 0
+    # A word starts where a word byte follows a non-word byte
+    return int(is_word[0]) + int(np.count_nonzero(is_word[1:] & ~is_word[:-1]))
+
+
+def reading_minutes(words: int) -> int:
+    return max(1, math.ceil(words / READING_WORDS_PER_MINUTE))
+
+
+def make_excerpt(content: str, length: int = EXCERPT_LENGTH) -> str:
+    """Plain text of the first paragraphs, cut at a word boundary"""
+    paragraphs = []
+    size = 0
+    for block in re.split(r"\n\s*\n", content):
+        if not block.strip() or _NON_PROSE_RE.match(block):
+            continue
+        text = _IMAGE_RE.sub("", block)
+        text = _LINK_RE.sub(r"\1", text)
+        text = " ".join(_INLINE_MARKUP_RE.sub("", text).split())
+        paragraphs.append(text)
+        size += len(text) + 1
+        if size > length:
+            break
+    excerpt = " ".join(paragraphs)
+    if len(excerpt) <= length:
+        return excerpt
+    cut = excerpt[:length + 1].rsplit(" ", 1)[0] if " " in excerpt[:length + 1] else excerpt[:length]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def reading_stats(content: str) -> Dict:
+    """Word count and reading time fields of an article"""
+    words = word_count(content)
+    minutes = reading_minutes(words)
+    return {"word_count": words, "reading_minutes": minutes, "read_time": f"{minutes} min"}
+
+
+def new_article(data: ArticleCreate) -> Article:
+    """Article for ``data``, with the fields derived from its content"""
+    fields = data.model_dump()
+    fields.update(reading_stats(data.content))
+    fields["excerpt"] = data.excerpt or make_excerpt(data.content)
+    return Article(**fields)
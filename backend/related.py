@@ -0,0 +1,265 @@
+"""Related articles from shared tags and similar text.
+
+The similarity of two articles mixes the cosine of their TF-IDF vectors over
+title, excerpt and content (terms from ``search.tokenize``, weighted per field
+as for search) with the Jaccard index of their tag sets. Term and tag
+postings are kept in growable arrays, so the similarities of one article to
+every other are a few NumPy calls: the postings of its terms are
+concatenated and summed per article with ``bincount``, and only articles
+sharing a term or one of the latest ``RELATED_TAG_ROWS`` articles of a tag
+are ever touched. The best ``RELATED_TOP_K`` neighbours of each article are
+kept in a table, so a lookup is a dict access.
+
+``build`` fills the table for every article; ``add_many`` scores new
+articles against the others and offers them to their tables, which only
+touches the neighbours whose k-th best score they beat. Document
+frequencies are counted as articles are inserted, so the IDF weights are one
+vectorized expression. IDF weights and vector norms move a little as
+articles are added, which the next build catches up. Both are CPU bound:
+``build`` and ``sync`` run them on a worker thread, and other callers should
+too, with the index lock serializing writers. Readers only look up the
+tables, which are replaced rather than modified in place.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from search import FIELD_WEIGHTS, SEARCH_SYNC_LAG, fold, term_frequencies
+
+logger = logging.getLogger(__name__)
+
+RELATED_TOP_K = int(os.environ.get("RELATED_TOP_K", "10"))
+# Share of the tag Jaccard index in the score, the text cosine gets the rest
+RELATED_TAG_WEIGHT = float(os.environ.get("RELATED_TAG_WEIGHT", "0.3"))
+# Terms found in more than this share of the articles do not link them
+RELATED_MAX_DF = float(os.environ.get("RELATED_MAX_DF", "0.5"))
+# Only the strongest terms of an article are used to look for neighbours
+RELATED_QUERY_TERMS = int(os.environ.get("RELATED_QUERY_TERMS", "64"))
+# Only the most recent articles of a tag are candidates through it, so that
+# common tags do not make every article a candidate
+RELATED_TAG_ROWS = int(os.environ.get("RELATED_TAG_ROWS", "1000"))
+
+# Below this many articles every term is kept, whatever its frequency
+_MAX_DF_MIN_ARTICLES = 50
+
+_PROJECTION = {"_id": 0, "id": 1, "tags": 1, "updated_at": 1, **dict.fromkeys(FIELD_WEIGHTS, 1)}
+
+
+def _view(values: array, dtype) -> np.ndarray:
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype=dtype)
+
+
+class RelatedIndex:
+    """Top-k table of similar articles"""
+
+    def __init__(self, top_k: int = RELATED_TOP_K, tag_weight: float = RELATED_TAG_WEIGHT):
+        self.top_k = top_k
+        self.tag_weight = tag_weight
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vocabulary: Dict[str, int] = {}
+        # term -> (rows, weighted term frequencies)
+        self._postings: List[Tuple[array, array]] = []
+        # term -> number of articles containing it
+        self._df = array("i")
+        self._tag_vocabulary: Dict[str, int] = {}
+        self._tag_postings: List[array] = []
+        self._doc_terms: List[np.ndarray] = []
+        self._doc_weights: List[np.ndarray] = []
+        self._doc_tags: List[List[int]] = []
+        self._tag_counts = array("i")
+        self._norms = array("d")
+        self._related: Dict[str, List[Tuple[float, str]]] = {}
+        # row -> score a new neighbour has to beat, 0 until the table is full
+        self._kth = array("d")
+        self.synced_until: Optional[datetime] = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def related(self, article_id: str, limit: int) -> List[str]:
+        """Ids of the articles most similar to ``article_id``, best first"""
+        return [related_id for _, related_id in self._related.get(article_id, ())[:limit]]
+
+    def _insert(self, article: dict, frequencies: Optional[Counter] = None) -> int:
+        row = len(self._ids)
+        self._ids.append(article["id"])
+        self._rows[article["id"]] = row
+
+        if frequencies is None:
+            frequencies = term_frequencies(article)
+        terms = np.empty(len(frequencies), dtype=np.intc)
+        for position, (term, frequency) in enumerate(frequencies.items()):
+            index = self._vocabulary.setdefault(term, len(self._vocabulary))
+            if index == len(self._postings):
+                self._postings.append((array("i"), array("d")))
+                self._df.append(0)
+            self._df[index] += 1
+            rows, weights = self._postings[index]
+            rows.append(row)
+            weights.append(frequency)
+            terms[position] = index
+        self._doc_terms.append(terms)
+        self._doc_weights.append(np.fromiter(frequencies.values(), dtype=np.float64, count=len(frequencies)))
+
+        tags = []
+        for tag in {fold(tag) for tag in article.get("tags") or ()}:
+            index = self._tag_vocabulary.setdefault(tag, len(self._tag_vocabulary))
+            if index == len(self._tag_postings):
+                self._tag_postings.append(array("i"))
+            self._tag_postings[index].append(row)
+            tags.append(index)
+        self._doc_tags.append(tags)
+        self._tag_counts.append(len(tags))
+        self._norms.append(0.0)
+        self._kth.append(0.0)
+        return row
+
+    def _idf(self) -> np.ndarray:
+        n_docs = len(self._ids)
+        df = _view(self._df, np.intc).astype(np.float64)
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        if n_docs >= _MAX_DF_MIN_ARTICLES:
+            idf[df > RELATED_MAX_DF * n_docs] = 0.0
+        return idf
+
+    def _vector_norm(self, row: int, idf: np.ndarray) -> float:
+        return math.sqrt(float(np.sum((self._doc_weights[row] * idf[self._doc_terms[row]]) ** 2)))
+
+    def _compute_norms(self, idf: np.ndarray):
+        lengths = np.fromiter((len(terms) for terms in self._doc_terms), dtype=np.intp, count=len(self._ids))
+        if not lengths.sum():
+            return
+        terms = np.concatenate(self._doc_terms)
+        weights = np.concatenate(self._doc_weights) * idf[terms]
+        rows = np.repeat(np.arange(len(self._ids)), lengths)
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(self._ids)))
+        self._norms = array("d", norms.tobytes())
+
+    def _similarities(self, row: int, idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Articles sharing a term or a tag with ``row`` and their similarity"""
+        terms = self._doc_terms[row]
+        query = self._doc_weights[row] * idf[terms]
+        if len(query) > RELATED_QUERY_TERMS:
+            strongest = np.argpartition(query, -RELATED_QUERY_TERMS)[-RELATED_QUERY_TERMS:]
+            terms, query = terms[strongest], query[strongest]
+        significant = query > 0
+        terms, query = terms[significant], query[significant]
+
+        text_rows = [_view(self._postings[term][0], np.intc) for term in terms]
+        text_weights = [_view(self._postings[term][1], np.float64) * (weight * idf[term])
+                        for term, weight in zip(terms, query)]
+        tag_rows = [_view(self._tag_postings[index], np.intc) for index in self._doc_tags[row]]
+        n_text = sum(len(rows) for rows in text_rows)
+        if not n_text and not tag_rows:
+            return np.empty(0, dtype=np.intc), np.empty(0)
+
+        # One bincount over the compacted candidate ids for the text
+        candidates, slots = np.unique(
+            np.concatenate(text_rows + [rows[-RELATED_TAG_ROWS:] for rows in tag_rows]), return_inverse=True
+        )
+        dot = np.bincount(slots[:n_text], weights=np.concatenate(text_weights) if text_weights else None,
+                          minlength=len(candidates))
+        # Tag postings are sorted by row, so the shared tags of every
+        # candidate are counted with binary searches over the whole postings
+        shared_tags = np.zeros(len(candidates), dtype=np.intc)
+        for rows in tag_rows:
+            positions = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+            shared_tags += rows[positions] == candidates
+
+        norms = _view(self._norms, np.float64)[candidates] * self._norms[row]
+        cosine = np.divide(dot, norms, out=np.zeros(len(candidates)), where=norms > 0)
+        tag_counts = _view(self._tag_counts, np.intc)[candidates]
+        union = tag_counts + self._tag_counts[row] - shared_tags
+        jaccard = np.divide(shared_tags, union, out=np.zeros(len(candidates)), where=union > 0)
+
+        scores = (1 - self.tag_weight) * cosine + self.tag_weight * jaccard
+        others = candidates != row
+        return candidates[others], scores[others]
+
+    def _top(self, candidates: np.ndarray, scores: np.ndarray) -> List[Tuple[float, str]]:
+        if len(candidates) > self.top_k:
+            best = np.argpartition(scores, -self.top_k)[-self.top_k:]
+            candidates, scores = candidates[best], scores[best]
+        top = [(float(score), self._ids[candidate]) for candidate, score in zip(candidates, scores) if score > 0]
+        top.sort(key=lambda entry: (-entry[0], entry[1]))
+        return top
+
+    def _set_table(self, row: int, table: List[Tuple[float, str]]):
+        self._related[self._ids[row]] = table
+        self._kth[row] = table[-1][0] if len(table) >= self.top_k else 0.0
+
+    def add(self, article: dict):
+        self.add_many([article])
+
+    def add_many(self, articles: List[dict], frequencies: Optional[List[Counter]] = None):
+        """Score new articles and offer them to the tables of their neighbours
+
+        ``frequencies`` are the articles' ``term_frequencies``, if already computed.
+        """
+        with self._lock:
+            for position, article in enumerate(articles):
+                if article["id"] in self._rows:
+                    continue
+                row = self._insert(article, frequencies[position] if frequencies else None)
+                idf = self._idf()
+                self._norms[row] = self._vector_norm(row, idf)
+                candidates, scores = self._similarities(row, idf)
+                self._set_table(row, self._top(candidates, scores))
+                # Only the neighbours whose k-th best score the new article beats
+                better = scores > _view(self._kth, np.float64)[candidates]
+                for candidate, score in zip(candidates[better].tolist(), scores[better].tolist()):
+                    table = self._related.get(self._ids[candidate], []) + [(score, article["id"])]
+                    table.sort(key=lambda entry: (-entry[0], entry[1]))
+                    self._set_table(candidate, table[:self.top_k])
+
+    def _build(self, articles: List[dict]):
+        with self._lock:
+            self._reset()
+            for article in articles:
+                self._insert(article)
+            idf = self._idf()
+            self._compute_norms(idf)
+            for row in range(len(self._ids)):
+                self._set_table(row, self._top(*self._similarities(row, idf)))
+
+    def _advance(self, articles: List[dict]):
+        # Only rows read by build and sync move the watermark, as in SearchIndex.sync
+        for article in articles:
+            updated_at = article.get("updated_at")
+            if updated_at and (self.synced_until is None or updated_at > self.synced_until):
+                self.synced_until = updated_at
+
+    async def build(self, collection):
+        """(Re)build the table from every article in ``collection``"""
+        articles = [article async for article in collection.find({}, _PROJECTION)]
+        await asyncio.to_thread(self._build, articles)
+        self._advance(articles)
+        logger.info("Related articles computed for %d articles", len(self))
+
+    async def sync(self, collection):
+        """Add articles created since the last build or sync"""
+        query = {}
+        if self.synced_until is not None:
+            query["updated_at"] = {"$gte": self.synced_until - SEARCH_SYNC_LAG}
+        articles = [article async for article in collection.find(query, _PROJECTION)]
+        self._advance(articles)
+        # The lag window reads recent articles again
+        articles = [article for article in articles if article["id"] not in self._rows]
+        if articles:
+            await asyncio.to_thread(self.add_many, articles)
+
+
+related_index = RelatedIndex()
@@ -0,0 +1,64 @@
+"""Markdown rendering of article bodies.
+
+Articles are rendered once, when they are written, instead of in every
+browser: ``render_article`` turns the markdown into sanitized HTML and
+extracts the table of contents, and the result is stored on the article
+next to the source (``content_html``, ``toc``). ``content_hash`` identifies
+the source and the renderer that produced the HTML, so a stored rendering
+whose hash does not match the content is stale and rendered again.
+"""
+import hashlib
+from typing import Dict, List
+
+import markdown
+import nh3
+from markdown.extensions.toc import slugify_unicode
+
+# Bump when the rendering changes to make every stored rendering stale
+RENDER_VERSION = 1
+
+_EXTENSIONS = ["toc", "fenced_code", "tables", "sane_lists"]
+# Heading anchors keep their accents: "sécurité-ia" rather than "scurit-ia"
+_EXTENSION_CONFIGS = {"toc": {"slugify": slugify_unicode}}
+
+# Defaults of the sanitizer, plus heading anchors and code languages
+_ALLOWED_ATTRIBUTES = {tag: set(attributes) for tag, attributes in nh3.ALLOWED_ATTRIBUTES.items()}
+for _heading in ("h1", "h2", "h3", "h4", "h5", "h6"):
+    _ALLOWED_ATTRIBUTES.setdefault(_heading, set()).add("id")
+_ALLOWED_ATTRIBUTES.setdefault("code", set()).add("class")
+
+# Fields written by render_article
+RENDERED_FIELDS = ("content_html", "toc", "content_hash")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.blake2b(f"{RENDER_VERSION}\n{content}".encode(), digest_size=16).hexdigest()
+
+
+def _toc(tokens: List[dict]) -> List[Dict]:
+    return [
+        {"level": token["level"], "id": token["id"], "name": token["name"], "children": _toc(token["children"])}
+        for token in tokens
+    ]
+
+
+def render_article(content: str) -> Dict:
+    """Rendered fields of an article with this markdown ``content``"""
+    # A Markdown instance keeps state between conversions, so one per call
+    renderer = markdown.Markdown(extensions=_EXTENSIONS, extension_configs=_EXTENSION_CONFIGS)
+    html = renderer.convert(content)
+    return {
+        "content_html": nh3.clean(html, attributes=_ALLOWED_ATTRIBUTES),
+        "toc": _toc(renderer.toc_tokens),
+        "content_hash": content_hash(content),
+    }
+
+
+def is_rendered(article: dict) -> bool:
+    """Whether the stored rendering matches the article's content"""
+    return article.get("content_hash") == content_hash(article["content"])
+
+
+def render_batch(contents: List[str]) -> List[Dict]:
+    """Render several articles, for process pool workers"""
+    return [render_article(content) for content in contents]
@@ -0,0 +1,254 @@
+"""In-process full-text search over articles.
+
+Articles are tokenized (accent folding, French stop words and light stemming)
+into an inverted index and ranked with BM25. The index also keeps the
+category, tags and reading time of each article, so matches are filtered and
+faceted without a round trip to MongoDB. The index is built from
+``articles_collection`` at startup, updated by ``create_article`` and kept in
+sync with writes made by other workers through a periodic ``sync``.
+
+``sync`` reads the articles written since its watermark minus
+``SEARCH_SYNC_LAG`` seconds: ``updated_at`` is stamped by the writing
+worker before the insert lands, so another worker's article can become
+visible after one with a later timestamp. Articles already indexed at the
+same ``updated_at`` are skipped, and only the rows ``sync`` reads move the
+watermark.
+"""
+import asyncio
+import functools
+import heapq
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Clock skew and insert latency tolerated between workers writing articles
+SEARCH_SYNC_LAG = timedelta(seconds=float(os.environ.get("SEARCH_SYNC_LAG", "10")))
+
+# Term frequency weight of each indexed field
+FIELD_WEIGHTS = {"title": 3.0, "excerpt": 2.0, "content": 1.0}
+
+STOPWORDS = frozenset("""
+a au aux avec c ce ces d dans de des du elle en est et etre il ils j je l la le
+les leur lui m ma mais me meme mes moi mon n ne nos notre nous on ou par pas
+pour qu que qui s sa se ses son sur t ta te tes toi ton tu un une vos votre vous
+y ete sont a ont plus cette comme tout tous
+""".split())
+
+# Derivational suffixes, as they look once final -s/-x, -r and -e are gone
+_SUFFIXES = ("issement", "ement", "ation", "atric", "ateu", "ienn", "iqu", "eus", "eux", "ien", "it")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Runs of characters other than ASCII punctuation and spaces, which fold to
+# themselves and always separate tokens
+_WORD_RE = re.compile(r"[^\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics (é -> e, ç -> c, œ -> oe)"""
+    text = text.lower().replace("œ", "oe").replace("æ", "ae")
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    # Look up the distinct characters only, then strip each mark in one pass
+    for ch in set(decomposed):
+        if unicodedata.combining(ch):
+            decomposed = decomposed.replace(ch, "")
+    return decomposed
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """Light French stemmer working on accent-folded tokens"""
+    if len(token) < 5 or token.isdigit():
+        return token
+    if token.endswith("aux") and not token.endswith("eaux"):
+        token = token[:-3] + "al"
+    elif token[-1] in "sx":
+        token = token[:-1]
+    if token.endswith("r"):
+        token = token[:-1]
+    if token.endswith("e"):
+        token = token[:-1]
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 2 and token[-1] == token[-2] and token[-1].isalpha():
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into stemmed search terms"""
+    return [stem(token) for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_terms(word: str) -> Tuple[str, ...]:
+    return tuple(tokenize(word))
+
+
+def term_frequencies(article: dict) -> Counter:
+    """Field-weighted frequencies of the terms of an article document"""
+    frequencies = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        # Words are counted first, then folded and stemmed through a cache
+        for word, count in Counter(_WORD_RE.findall((article.get(field) or "").lower())).items():
+            for term in _word_terms(word):
+                frequencies[term] += weight * count
+    return frequencies
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._category: Dict[str, str] = {}
+        self._tags: Dict[str, Tuple[str, ...]] = {}
+        self._reading_minutes: Dict[str, int] = {}
+        self._updated_at: Dict[str, Optional[datetime]] = {}
+        self._total_len = 0.0
+        self.synced_until: Optional[datetime] = None
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, article: dict, frequencies: Optional[Counter] = None):
+        """Index an article document, replacing any previous version
+
+        ``frequencies`` are the article's ``term_frequencies`` when the caller
+        computed them already, e.g. off the event loop.
+        """
+        doc_id = article["id"]
+        self.remove(doc_id)
+
+        if frequencies is None:
+            frequencies = term_frequencies(article)
+
+        for term, frequency in frequencies.items():
+            self._postings[term][doc_id] = frequency
+        length = sum(frequencies.values())
+        self._doc_terms[doc_id] = tuple(frequencies)
+        self._doc_len[doc_id] = length
+        self._category[doc_id] = article.get("category")
+        self._tags[doc_id] = tuple(set(article.get("tags") or ()))
+        self._reading_minutes[doc_id] = article.get("reading_minutes", 0)
+        self._updated_at[doc_id] = article.get("updated_at")
+        self._total_len += length
+
+    def remove(self, doc_id: str):
+        """Drop an article from the index"""
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        self._category.pop(doc_id, None)
+        self._tags.pop(doc_id, None)
+        self._reading_minutes.pop(doc_id, None)
+        self._updated_at.pop(doc_id, None)
+
+    def _candidates(self, terms: List[str], category: Optional[str],
+                    max_read_time: Optional[int] = None) -> List[str]:
+        """Ids of the articles containing every term, rarest posting list first"""
+        postings = [self._postings.get(term) for term in terms]
+        if not postings or not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        if category is not None:
+            candidates = [doc_id for doc_id in candidates if self._category.get(doc_id) == category]
+        if max_read_time is not None:
+            candidates = [doc_id for doc_id in candidates if self._reading_minutes.get(doc_id, 0) <= max_read_time]
+        return list(candidates)
+
+    def match(self, query: str, category: Optional[str] = None,
+              max_read_time: Optional[int] = None) -> List[str]:
+        """Ids of the articles matching every query term, unranked"""
+        return self._candidates(list(dict.fromkeys(tokenize(query))), category, max_read_time)
+
+    def facets(self, doc_ids: List[str]) -> Dict[str, Counter]:
+        """Category and tag counts of indexed articles, as ``facets.FACET_FIELDS``"""
+        categories = Counter(self._category.get(doc_id) for doc_id in doc_ids)
+        tags = Counter(tag for doc_id in doc_ids for tag in self._tags.get(doc_id, ()))
+        return {"category": categories, "tag": tags}
+
+    def rank(self, query: str, category: Optional[str] = None,
+             limit: Optional[int] = None,
+             max_read_time: Optional[int] = None) -> Tuple[int, List[Tuple[float, str]]]:
+        """Return the number of matches and the best (score, id) pairs by BM25"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        candidates = self._candidates(terms, category, max_read_time)
+        if not candidates:
+            return 0, []
+
+        n_docs = len(self._doc_len)
+        avg_len = self._total_len / n_docs if n_docs else 1.0
+        k1, b = self.k1, self.b
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in terms:
+            postings = self._postings[term]
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id in candidates:
+                tf = postings[doc_id]
+                norm = k1 * (1 - b + b * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+        # Ties are broken on id so that paging through results is stable
+        ranked = ((score, doc_id) for doc_id, score in scores.items())
+        if limit is None:
+            hits = sorted(ranked, reverse=True)
+        else:
+            hits = heapq.nlargest(limit, ranked)
+        return len(candidates), hits
+
+    async def build(self, collection):
+        """(Re)build the index from every article in ``collection``"""
+        self._reset()
+        await self.sync(collection)
+        logger.info("Search index built with %d articles", len(self))
+
+    async def sync(self, collection):
+        """Index articles written since the last build or sync"""
+        query = {}
+        if self.synced_until is not None:
+            query["updated_at"] = {"$gte": self.synced_until - SEARCH_SYNC_LAG}
+        projection = {"_id": 0, "id": 1, "category": 1, "tags": 1, "reading_minutes": 1, "updated_at": 1,
+                      **dict.fromkeys(FIELD_WEIGHTS, 1)}
+        articles = []
+        async for article in collection.find(query, projection):
+            updated_at = article.get("updated_at")
+            if updated_at and (self.synced_until is None or updated_at > self.synced_until):
+                self.synced_until = updated_at
+            # The lag window reads recent articles again
+            if article["id"] in self._doc_len and self._updated_at.get(article["id"]) == updated_at:
+                continue
+            articles.append(article)
+        # Tokenize on a worker thread, update the postings on the event loop
+        frequencies = await asyncio.to_thread(lambda: [term_frequencies(article) for article in articles])
+        for article, terms in zip(articles, frequencies):
+            self.add(article, terms)
+
+
+search_index = SearchIndex()
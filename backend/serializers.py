@@ -0,0 +1,50 @@
+"""JSON encoding of trusted database documents.
+
+Documents read back from MongoDB were validated when they were written, so
+read handlers do not build models from them. A ``DocumentSerializer`` keeps
+the field map of a response model (field names in declaration order and the
+defaults of optional fields) and encodes a document by picking those fields
+into a dict handed to orjson: Mongo's ``_id`` and any other stored field the
+model does not declare are left out, fields missing from older documents get
+their model default, and the output matches ``model_dump_json`` for the same
+document. Writes still validate (``ArticleCreate``, ``CommentCreate``).
+"""
+from typing import Any, Dict, Iterable, Tuple, Type
+
+import orjson
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+
+class DocumentSerializer:
+    """Encoder of documents shaped like ``model``, without validating them"""
+
+    def __init__(self, model: Type[BaseModel], exclude: Iterable[str] = ()):
+        excluded = set(exclude)
+        self.fields: Tuple[str, ...] = tuple(name for name in model.model_fields if name not in excluded)
+        # Defaults of optional fields, for documents written before they existed
+        self.defaults: Dict[str, Any] = {
+            name: field.default for name, field in model.model_fields.items()
+            if name in self.fields and field.default is not PydanticUndefined
+        }
+        # Models allowing extras (summaries with ``fields=``) pass other keys through
+        self.extras = model.model_config.get("extra") == "allow"
+        self._skip = frozenset(self.fields) | {"_id"} | excluded
+
+    def to_dict(self, document: dict) -> dict:
+        defaults = self.defaults
+        data = {
+            name: document[name] if name in document else defaults[name]
+            for name in self.fields
+            if name in document or name in defaults
+        }
+        if self.extras:
+            data.update((key, value) for key, value in document.items() if key not in self._skip)
+        return data
+
+    def dumps(self, document: dict) -> bytes:
+        return orjson.dumps(self.to_dict(document))
+
+    def dumps_many(self, documents: Iterable[dict]) -> bytes:
+        """Encode documents as one JSON array"""
+        return orjson.dumps([self.to_dict(document) for document in documents])
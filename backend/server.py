@@ -1,11 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+import orjson
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Set
 import uuid
 from datetime import datetime
 
@@ -14,169 +18,742 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 from models import (
-    Article, ArticleCreate, ArticlesResponse,
+    Article, ArticleCreate, ArticleHTML, ArticleSummary, ArticlesResponse,
     Comment, CommentCreate,
-    CielInfo, Formation
+    CielInfo, Formation, BulkIngestResponse, FacetsResponse
 )
 from database import (
     articles_collection, comments_collection, 
-    ciel_info_collection, formations_collection,
-    seed_database
+    ciel_info_collection, formations_collection, events_collection, trending_collection,
+    facets_collection,
+    client, seed_database, transactions_supported,
+    Consistency, LocalWriteReads, read_collection
 )
+from indexes import ensure_indexes, verify_query_plans
+from search import search_index, term_frequencies, tokenize
+from counts import count_cache
+from cache import article_cache, reference_cache
+from conditional import (
+    CachedBody, article_etag, comments_etag, conditional_response, is_not_modified, not_modified
+)
+from counters import make_counter
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from export import EXPORT_BATCH_SIZE, gzip_chunks, ndjson_line, sse_event, stream_batches
+from ingest import ingest_articles, iter_json_array, iter_ndjson
+from events import EventHub, make_broker
+from trending import TRENDING_REBUILD_INTERVAL, trending_index
+from facets import count_facets, load_facets, rebuild_facets, record_articles, sorted_counts
+from related import RELATED_TOP_K, related_index
+from render import RENDERED_FIELDS, is_rendered, render_article
+from reading import new_article
+from maintenance import backfill_reading_stats
+from compression import CompressionMiddleware, compressed_cache
+from serializers import DocumentSerializer
+import mongo
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_db()
+    yield
+    await shutdown_db_client()
 
 # Create the main app without a prefix
-app = FastAPI(title="CIEL Cybersecurity Blog API")
+# orjson serializes what routes return (datetimes natively); cached bodies are already bytes
+app = FastAPI(title="CIEL Cybersecurity Blog API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Like counters (direct, coalesced or write-behind, see LIKE_COUNTER_MODE)
+article_likes = make_counter(articles_collection)
+# Comment likes carry the article id, for the article's event subscribers
+comment_likes = make_counter(comments_collection, carried=("article_id",))
+
+# Read routing: listings, facets, comment threads, exports and reference data may
+# lag behind writes and are served by secondaries when there are any. Article
+# details, existence checks and counters read back after a write stay on the
+# primary. Article reads follow the writes of this worker for a while, so the
+# listing and count caches dropped by a new article are refilled with it.
+listing_reads = LocalWriteReads(articles_collection)
+comment_reads = read_collection(comments_collection, Consistency.EVENTUAL)
+ciel_info_reads = read_collection(ciel_info_collection, Consistency.EVENTUAL)
+formation_reads = read_collection(formations_collection, Consistency.EVENTUAL)
+facet_reads = read_collection(facets_collection, Consistency.EVENTUAL)
+
+# Pushes new comments and like counts to the pages showing an article
+event_hub = EventHub(make_broker(events_collection))
+
+# Sort key of each listing order, ties broken on id in the same direction
+SORT_FIELDS = {
+    "recent": ("published_at", -1),
+    "popular": ("likes", -1),
+    "comments": ("comment_count", -1),
+    # Shortest reads first
+    "read_time": ("reading_minutes", 1)
+}
+
+# Searches sorted by a field send their matches as an $in up to this many ids;
+# beyond, the sort index is scanned in batches and filtered in process
+SEARCH_IN_MAX = int(os.environ.get("SEARCH_IN_MAX", "500"))
+SEARCH_SCAN_BATCH = int(os.environ.get("SEARCH_SCAN_BATCH", "1000"))
+
+# Read handlers encode stored documents without building models, see serializers.py
+article_json = DocumentSerializer(Article)
+article_html_json = DocumentSerializer(ArticleHTML, exclude=["content"])
+summary_json = DocumentSerializer(ArticleSummary)
+comment_json = DocumentSerializer(Comment)
+ciel_info_json = DocumentSerializer(CielInfo)
+formation_json = DocumentSerializer(Formation)
+
+# Listings project only the summary fields; these can be requested on top
+OPTIONAL_ARTICLE_FIELDS = ("content", "created_at", "updated_at")
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    extra_fields = sorted({name.strip() for name in (fields or "").split(",")} - {""})
+    for field in extra_fields:
+        if field not in OPTIONAL_ARTICLE_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    return extra_fields
+
+def _list_projection(extra_fields: List[str]) -> dict:
+    projection = dict.fromkeys(ArticleSummary.model_fields, 1)
+    projection["_id"] = 0
+    projection.update(dict.fromkeys(extra_fields, 1))
+    return projection
+
 # Articles endpoints
 @api_router.get("/articles", response_model=ArticlesResponse)
 async def get_articles(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     category: Optional[str] = None,
     search: Optional[str] = None,
-    sort: str = Query("recent", regex="^(recent|popular|comments)$")
+    sort: str = Query("recent", regex="^(recent|popular|comments|relevance|trending|read_time)$"),
+    max_read_time: Optional[int] = Query(None, ge=1, description="Maximum reading time in minutes"),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex="^(exact|estimated|none)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated extra fields: content, created_at, updated_at")
 ):
-    """Get articles with pagination and filters"""
-    skip = (page - 1) * limit
+    """Get articles with pagination and filters
+
+    Pass the ``next_cursor`` of a response as ``cursor`` to get the following
+    page at constant cost; ``page`` is ignored when a cursor is given.
+    ``sort=trending`` ranks by likes and comments with a time decay,
+    ``sort=read_time`` puts the shortest reads first.
+    ``count=estimated`` allows an approximate ``total`` and ``count=none``
+    skips it, which is what infinite-scroll clients want.
+    """
+    extra_fields = _parse_fields(fields)
+    
+    # Relevance ranking only makes sense for a search
+    if sort == "relevance" and not search:
+        sort = "recent"
+    
+    key = article_cache.listing_key(
+        page=None if cursor else page, cursor=cursor, limit=limit,
+        category=category, search=" ".join(tokenize(search)) if search else None,
+        sort=sort, max_read_time=max_read_time, count=count, fields=",".join(extra_fields) or None
+    )
+    
+    async def load():
+        response = await _list_articles(page, limit, category, search, sort, max_read_time, cursor, count,
+                                        extra_fields)
+        article_cache.track_listing(key, sort, (article["id"] for article in response["articles"]))
+        return orjson.dumps(response)
+    
+    return conditional_response(request, await article_cache.get_or_load(key, load), "listing")
+
+async def _list_articles(page: int, limit: int, category: Optional[str], search: Optional[str],
+                         sort: str, max_read_time: Optional[int], cursor: Optional[str], count: str,
+                         extra_fields: List[str]) -> dict:
+    """Body of an ``ArticlesResponse``"""
+    skip = 0 if cursor else (page - 1) * limit
+    projection = _list_projection(extra_fields)
+    
+    if sort in ("relevance", "trending"):
+        # Rank in memory, then fetch only the requested page
+        if sort == "trending":
+            after = _decode_cursor(cursor, sort) if cursor else None
+            only = None
+            if search:
+                only = set(search_index.match(search, category=category, max_read_time=max_read_time))
+            elif max_read_time is not None:
+                # Covered by the read_time index
+                only = set(await listing_reads.distinct("id", {"reading_minutes": {"$lte": max_read_time}}))
+            total, hits = trending_index.page(category, limit, skip=skip, after=after, only=only)
+        elif cursor:
+            total, hits = search_index.rank(search, category=category, max_read_time=max_read_time)
+            after = _decode_cursor(cursor, sort)
+            hits = [hit for hit in hits if hit < after][:limit]
+        else:
+            total, hits = search_index.rank(search, category=category, limit=skip + limit,
+                                            max_read_time=max_read_time)
+            hits = hits[skip:]
+        page_ids = [article_id for _, article_id in hits]
+        articles = await listing_reads.find({"id": {"$in": page_ids}}, projection).to_list(limit)
+        by_id = {article["id"]: article for article in articles}
+        articles = [by_id[article_id] for article_id in page_ids if article_id in by_id]
+        next_cursor = None
+        if len(hits) == limit:
+            next_cursor = encode_cursor(sort, *hits[-1])
+        _merge_pending_likes(articles, article_likes)
+        return _listing_body(articles, total if count != "none" else None, False, page, limit, next_cursor)
     
     # Build query
     query = {}
     if category:
         query["category"] = category
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"excerpt": {"$regex": search, "$options": "i"}},
-            {"content": {"$regex": search, "$options": "i"}}
-        ]
+        matching_ids = search_index.match(search, category=category, max_read_time=max_read_time)
+        # Larger match sets are filtered while scanning the sort index, see _scan_matches
+        if len(matching_ids) <= SEARCH_IN_MAX:
+            query["id"] = {"$in": matching_ids}
+    if max_read_time is not None:
+        query["reading_minutes"] = {"$lte": max_read_time}
     
     # Build sort
-    sort_options = {
-        "recent": {"published_at": -1},
-        "popular": {"likes": -1},
-        "comments": {"comment_count": -1}
-    }
-    sort_query = sort_options.get(sort, {"published_at": -1})
+    sort_field, direction = SORT_FIELDS[sort]
+    sort_query = [(sort_field, direction), ("id", direction)]
+    
+    # Continue after the cursor position instead of skipping
+    find_query = query
+    if cursor:
+        value, after_id = _decode_cursor(cursor, sort)
+        find_query = {**query, **keyset_filter(sort_field, direction, value, after_id)}
     
     # Get articles and total count
-    articles_cursor = articles_collection.find(query).sort(list(sort_query.items())).skip(skip).limit(limit)
-    articles = await articles_cursor.to_list(limit)
-    total = await articles_collection.count_documents(query)
-    
-    return ArticlesResponse(
-        articles=[Article(**article) for article in articles],
-        total=total,
-        page=page,
-        limit=limit
-    )
+    if search and "id" not in query:
+        articles = await _scan_matches(find_query, projection, sort_query, set(matching_ids), skip, limit)
+    else:
+        articles_cursor = listing_reads.find(find_query, projection).sort(sort_query).skip(skip).limit(limit)
+        articles = await articles_cursor.to_list(limit)
+    
+    # The cursor holds the stored sort value that the next page's range compares
+    # with, so it is built before the buffered likes are merged in. The page stays
+    # in stored order: an article with buffered likes may show more than the one
+    # before it until the buffer is flushed.
+    next_cursor = None
+    if len(articles) == limit:
+        last = articles[-1]
+        next_cursor = encode_cursor(sort, last[sort_field], last["id"])
+    _merge_pending_likes(articles, article_likes)
+    
+    total_estimated = False
+    if count == "none":
+        total = None
+    elif search:
+        total = len(matching_ids)
+    elif count == "estimated" and not category and max_read_time is None:
+        # Read from collection metadata, no scan at all
+        total = await listing_reads.estimated_document_count()
+        total_estimated = True
+    else:
+        total = count_cache.get(category, max_read_time)
+        if total is None:
+            generation = count_cache.generation
+            total = await listing_reads.count_documents(query)
+            count_cache.set(category, max_read_time, total, generation)
+    
+    return _listing_body(articles, total, total_estimated, page, limit, next_cursor)
+
+def _listing_body(articles: List[dict], total: Optional[int], total_estimated: bool, page: int, limit: int,
+                  next_cursor: Optional[str]) -> dict:
+    return {
+        "articles": [summary_json.to_dict(article) for article in articles],
+        "total": total,
+        "total_estimated": total_estimated,
+        "page": page,
+        "limit": limit,
+        "next_cursor": next_cursor
+    }
+
+async def _scan_matches(query: dict, projection: dict, sort_query: list, matches: Set[str],
+                        skip: int, limit: int) -> List[dict]:
+    """Page of the articles in ``matches``, in ``sort_query`` order
+
+    Ids and sort keys are read from the sort index (a covered scan) and
+    filtered in process, then only the page is fetched; the request stays
+    the same size whatever the number of matches.
+    """
+    sort_field = sort_query[0][0]
+    page_ids = []
+    keys = listing_reads.find(query, {"_id": 0, "id": 1, sort_field: 1}).sort(sort_query).batch_size(SEARCH_SCAN_BATCH)
+    try:
+        async for key in keys:
+            if key["id"] not in matches:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page_ids.append(key["id"])
+            if len(page_ids) == limit:
+                break
+    finally:
+        await keys.close()
+    articles = await listing_reads.find({"id": {"$in": page_ids}}, projection).to_list(limit)
+    by_id = {article["id"]: article for article in articles}
+    return [by_id[article_id] for article_id in page_ids if article_id in by_id]
+
+def _merge_pending_likes(documents: List[dict], counter):
+    """Add likes still buffered in this worker so clients read their own writes"""
+    for document in documents:
+        document["likes"] += counter.pending(document["id"])
+
+def _decode_cursor(cursor: str, sort: str):
+    try:
+        return decode_cursor(cursor, sort)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @api_router.get("/articles/{article_id}", response_model=Article)
-async def get_article(article_id: str):
-    """Get a specific article by ID"""
-    article = await articles_collection.find_one({"id": article_id})
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    return Article(**article)
+async def get_article(
+    request: Request,
+    article_id: str,
+    format: str = Query("markdown", regex="^(markdown|html)$")
+):
+    """Get a specific article by ID
+
+    With ``format=html`` the body is the pre-rendered HTML and its table of
+    contents (``ArticleHTML``) instead of the markdown ``content``.
+    """
+    key = article_cache.detail_key(article_id, format)
+    
+    # Revalidate from the cache entry or a version-only projection
+    if "if-none-match" in request.headers:
+        entry = await article_cache.get(key)
+        if entry is not None:
+            etag = entry.etag
+        else:
+            version = await articles_collection.find_one(
+                {"id": article_id},
+                {"_id": 0, "likes": 1, "comment_count": 1, "updated_at": 1}
+            )
+            if not version:
+                raise HTTPException(status_code=404, detail="Article not found")
+            version["likes"] += article_likes.pending(article_id)
+            etag = article_etag(version)
+        if is_not_modified(request, etag):
+            return not_modified(etag, "article")
+    
+    async def load():
+        # Each format leaves the other representation of the body in the database
+        if format == "html":
+            article = await articles_collection.find_one({"id": article_id}, {"_id": 0})
+        else:
+            article = await articles_collection.find_one({"id": article_id}, {"_id": 0, "content_html": 0, "toc": 0})
+        if not article:
+            raise HTTPException(status_code=404, detail="Article not found")
+        article["likes"] += article_likes.pending(article_id)
+        if format == "markdown":
+            body = article_json.dumps(article)
+        else:
+            if not is_rendered(article):
+                await _render_stale(article)
+            body = article_html_json.dumps(article)
+        return CachedBody(body, article_etag(article))
+    
+    return conditional_response(request, await article_cache.get_or_load(key, load), "article")
+
+async def _render_stale(article: dict):
+    """Render an article whose stored HTML is missing or older than its content"""
+    article.update(await asyncio.to_thread(render_article, article["content"]))
+    # Only if the content did not change meanwhile
+    await articles_collection.update_one(
+        {"id": article["id"], "content": article["content"]},
+        {"$set": {field: article[field] for field in RENDERED_FIELDS}}
+    )
 
 @api_router.post("/articles/{article_id}/like")
 async def like_article(article_id: str):
     """Like an article"""
-    result = await articles_collection.update_one(
-        {"id": article_id},
-        {"$inc": {"likes": 1}}
-    )
-    if result.matched_count == 0:
+    likes = await article_likes.increment(article_id)
+    if likes is None:
         raise HTTPException(status_code=404, detail="Article not found")
-    
-    # Get updated article
-    article = await articles_collection.find_one({"id": article_id})
-    return {"likes": article["likes"]}
+    await article_cache.patch(article_id, likes=likes)
+    trending_index.liked(article_id)
+    event_hub.article_liked(article_id, likes)
+    return {"likes": likes}
 
 @api_router.post("/articles", response_model=Article)
 async def create_article(article_data: ArticleCreate):
     """Create a new article"""
-    article = Article(**article_data.dict())
-    await articles_collection.insert_one(article.dict())
+    article = new_article(article_data)
+    rendered = await asyncio.to_thread(render_article, article.content)
+    await articles_collection.insert_one({**article.dict(), **rendered})
+    await _articles_created([article.dict()])
     return article
 
+@api_router.post("/articles/bulk", response_model=BulkIngestResponse)
+async def create_articles_bulk(request: Request):
+    """Create many articles from a JSON array or an NDJSON body
+
+    Send NDJSON with ``Content-Type: application/x-ndjson``; it is parsed as
+    it streams in. Invalid items are reported by position and do not stop
+    the others from being inserted.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = iter_ndjson(request.stream())
+    else:
+        try:
+            items = iter_json_array(await request.body())
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON array: {exc}")
+    return await ingest_articles(items, articles_collection, _articles_ingested)
+
+async def _articles_created(articles: List[dict], score_related: bool = True):
+    """Bring the search index, rankings, related articles, facets and listing caches up to date with new articles"""
+    # Tokenizing and related-article scoring run on a worker thread; only the
+    # postings read by the request handlers are updated on the event loop
+    frequencies = await asyncio.to_thread(lambda: [term_frequencies(article) for article in articles])
+    for article, terms in zip(articles, frequencies):
+        search_index.add(article, terms)
+        trending_index.add(article)
+    if score_related:
+        await asyncio.to_thread(related_index.add_many, articles, frequencies)
+    await record_articles(facets_collection, articles)
+    listing_reads.wrote()
+    count_cache.invalidate()
+    await article_cache.invalidate_listings()
+
+async def _articles_ingested(articles: List[dict]):
+    """``_articles_created`` for bulk ingests, whose related articles are scored by the next ``sync_search_index``
+
+    Scoring takes most of the time of an ingest, and the periodic sync
+    already picks up the articles written by other workers.
+    """
+    await _articles_created(articles, score_related=False)
+
+@api_router.get("/articles/{article_id}/related", response_model=List[ArticleSummary])
+async def get_related_articles(article_id: str, limit: int = Query(4, ge=1, le=RELATED_TOP_K)):
+    """Articles most similar to this one, by shared tags and text
+
+    Neighbours come from the precomputed table of ``related_index``, so the
+    only query is fetching the summaries.
+    """
+    related_ids = related_index.related(article_id, limit)
+    if not related_ids:
+        if not await listing_reads.find_one({"id": article_id}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=404, detail="Article not found")
+        return []
+    by_id = {
+        article["id"]: article
+        async for article in listing_reads.find({"id": {"$in": related_ids}}, _list_projection([]))
+    }
+    articles = [by_id[related_id] for related_id in related_ids if related_id in by_id]
+    _merge_pending_likes(articles, article_likes)
+    return Response(summary_json.dumps_many(articles), media_type="application/json")
+
+@api_router.get("/facets", response_model=FacetsResponse)
+async def get_facets(category: Optional[str] = None, search: Optional[str] = None):
+    """Category and tag counts for the listing filters
+
+    Without filters this is one read of the materialized counts; with
+    ``search`` the matches are counted from the search index, with only
+    ``category`` the category's articles are counted in one aggregation.
+    """
+    if search:
+        counts = sorted_counts(search_index.facets(search_index.match(search, category=category)))
+    elif category:
+        counts = await count_facets(listing_reads, {"category": category})
+    else:
+        counts = await load_facets(facet_reads)
+    return FacetsResponse(
+        categories=counts["category"],
+        tags=counts["tag"],
+        total=sum(entry["count"] for entry in counts["category"])
+    )
+
 # Comments endpoints
+COMMENTS_STREAM_BATCH = int(os.environ.get("COMMENTS_STREAM_BATCH", "100"))
+
 @api_router.get("/articles/{article_id}/comments", response_model=List[Comment])
-async def get_comments(article_id: str):
-    """Get comments for an article"""
-    comments_cursor = comments_collection.find({"article_id": article_id}).sort("published_at", 1)
-    comments = await comments_cursor.to_list(1000)
-    return [Comment(**comment) for comment in comments]
+async def get_comments(
+    request: Request,
+    article_id: str,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: Optional[str] = Query(None, regex="^(ndjson|sse)$")
+):
+    """Get comments for an article, oldest first
+
+    When the page is full, the ``X-Next-Cursor`` header holds the ``cursor``
+    of the next page. ``stream=ndjson`` or ``stream=sse`` sends the rest of
+    the thread as it is read, whatever ``limit``; each SSE message has the
+    cursor after its comment as id, so a reconnecting EventSource resumes
+    where it stopped.
+    """
+    thread = {"article_id": article_id}
+    thread_order = [("published_at", 1), ("id", 1)]
+    if stream == "sse" and not cursor:
+        cursor = request.headers.get("last-event-id")
+    if cursor:
+        value, after_id = _decode_cursor(cursor, "thread")
+        thread.update(keyset_filter("published_at", 1, value, after_id))
+    
+    if stream:
+        return _stream_comments(thread, thread_order, stream)
+    
+    # Revalidate from the id/likes pairs only
+    if "if-none-match" in request.headers:
+        versions = await comment_reads.find(
+            thread, {"_id": 0, "id": 1, "likes": 1, "published_at": 1}
+        ).sort(thread_order).limit(limit).to_list(limit)
+        _merge_pending_likes(versions, comment_likes)
+        etag = comments_etag(versions)
+        if is_not_modified(request, etag):
+            response = not_modified(etag, "comments")
+            response.headers.update(_next_thread_cursor(versions, limit))
+            return response
+    
+    comments_cursor = comment_reads.find(thread).sort(thread_order).limit(limit)
+    comments = await comments_cursor.to_list(limit)
+    _merge_pending_likes(comments, comment_likes)
+    body = comment_json.dumps_many(comments)
+    response = conditional_response(request, CachedBody(body, comments_etag(comments)), "comments")
+    response.headers.update(_next_thread_cursor(comments, limit))
+    return response
+
+def _next_thread_cursor(comments: List[dict], limit: int) -> dict:
+    if len(comments) < limit:
+        return {}
+    last = comments[-1]
+    return {"X-Next-Cursor": encode_cursor("thread", last["published_at"], last["id"])}
+
+def _stream_comments(query: dict, order: list, mode: str) -> StreamingResponse:
+    cursor = comment_reads.find(query, {"_id": 0}).sort(order)
+    
+    def encode(comment: dict) -> bytes:
+        comment["likes"] += comment_likes.pending(comment["id"])
+        if mode == "ndjson":
+            return ndjson_line(comment)
+        return sse_event(comment, event_id=encode_cursor("thread", comment["published_at"], comment["id"]))
+    
+    chunks = stream_batches(cursor, COMMENTS_STREAM_BATCH, encode)
+    if mode == "ndjson":
+        return StreamingResponse(chunks, media_type="application/x-ndjson")
+    
+    async def events():
+        async for chunk in chunks:
+            yield chunk
+        # Tell EventSource clients not to reconnect
+        yield sse_event({}, event="end")
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @api_router.post("/articles/{article_id}/comments", response_model=Comment)
 async def create_comment(article_id: str, comment_data: CommentCreate):
     """Add a comment to an article"""
-    # Check if article exists
-    article = await articles_collection.find_one({"id": article_id})
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    
-    # Create comment
     comment = Comment(
         article_id=article_id,
         **comment_data.dict()
     )
-    await comments_collection.insert_one(comment.dict())
     
-    # Update article comment count
-    await articles_collection.update_one(
-        {"id": article_id},
-        {"$inc": {"comment_count": 1}}
-    )
+    if await transactions_supported():
+        async def insert_comment(session):
+            comment_count = await _bump_comment_count(article_id, 1, session=session)
+            await comments_collection.insert_one(comment.dict(), session=session)
+            return comment_count
+        
+        async with await client.start_session() as session:
+            comment_count = await session.with_transaction(insert_comment)
+    else:
+        # Without transactions, undo the counter bump if the insert fails
+        comment_count = await _bump_comment_count(article_id, 1)
+        try:
+            await comments_collection.insert_one(comment.dict())
+        except Exception:
+            await _bump_comment_count(article_id, -1)
+            raise
     
+    await article_cache.patch(article_id, comment_count=comment_count)
+    trending_index.commented(article_id)
+    await event_hub.comment_created(comment.model_dump(mode="json"), comment_count)
     return comment
 
+async def _bump_comment_count(article_id: str, delta: int, session=None) -> int:
+    """Check the article exists and update its comment count in one round trip"""
+    article = await articles_collection.find_one_and_update(
+        {"id": article_id},
+        {"$inc": {"comment_count": delta}},
+        projection={"_id": 0, "comment_count": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return article["comment_count"]
+
 @api_router.post("/comments/{comment_id}/like")
 async def like_comment(comment_id: str):
     """Like a comment"""
-    result = await comments_collection.update_one(
-        {"id": comment_id},
-        {"$inc": {"likes": 1}}
-    )
-    if result.matched_count == 0:
+    comment = await comment_likes.increment_document(comment_id)
+    if comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
+    likes = comment["likes"]
+    event_hub.comment_liked(comment["article_id"], comment_id, likes)
+    return {"likes": likes}
+
+# Real-time events
+EVENTS_KEEPALIVE = float(os.environ.get("EVENTS_KEEPALIVE", "15"))
+
+@api_router.get("/articles/{article_id}/events")
+async def article_events(article_id: str):
+    """Push new comments and like counts of an article as Server-Sent Events
+
+    Event types are ``comment`` and ``likes``; a ``likes`` event carries the
+    counters that changed since the previous one. A client that falls too far
+    behind is disconnected and reconnects.
+    """
+    if not await articles_collection.find_one({"id": article_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Article not found")
+    
+    async def events():
+        async with event_hub.subscribe(article_id) as subscription:
+            # Flush headers right away so the client sees the stream open
+            yield b": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield sse_event(event, event=event["type"])
     
-    # Get updated comment
-    comment = await comments_collection.find_one({"id": comment_id})
-    return {"likes": comment["likes"]}
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@api_router.websocket("/articles/{article_id}/ws")
+async def article_socket(websocket: WebSocket, article_id: str):
+    """Same events as ``/events``, as JSON messages over a WebSocket
+
+    An unknown article gets a 404 instead of the handshake, or a close with
+    code 4404 where the server cannot send HTTP responses to WebSocket
+    requests.
+    """
+    if not await articles_collection.find_one({"id": article_id}, {"_id": 0, "id": 1}):
+        if "websocket.http.response" in websocket.scope.get("extensions", {}):
+            await websocket.send_denial_response(
+                ORJSONResponse({"detail": "Article not found"}, status_code=404)
+            )
+        else:
+            await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    async with event_hub.subscribe(article_id) as subscription:
+        receiver = asyncio.create_task(websocket.receive())
+        getter = asyncio.create_task(subscription.get())
+        try:
+            while True:
+                await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver.done():
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        return
+                    # Clients have nothing to say, only their leaving matters
+                    receiver = asyncio.create_task(websocket.receive())
+                if getter.done():
+                    event = getter.result()
+                    if event is None:
+                        # Try again later
+                        await websocket.close(code=1013)
+                        return
+                    await websocket.send_json(event)
+                    getter = asyncio.create_task(subscription.get())
+        finally:
+            receiver.cancel()
+            getter.cancel()
+
+# Export endpoints
+@api_router.get("/export/articles")
+async def export_articles(
+    since: Optional[datetime] = Query(None, description="Only articles updated at or after this time"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    gzip: bool = False
+):
+    """Stream every article as NDJSON, oldest update first
+
+    Pass the ``updated_at`` of the last line received as ``since`` to pull
+    only what changed; the boundary documents are sent again.
+    """
+    return _export(listing_reads, "updated_at", since, batch_size, gzip)
+
+@api_router.get("/export/comments")
+async def export_comments(
+    since: Optional[datetime] = Query(None, description="Only comments published at or after this time"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    gzip: bool = False
+):
+    """Stream every comment as NDJSON, oldest first"""
+    return _export(comment_reads, "published_at", since, batch_size, gzip)
+
+def _export(collection, field: str, since: Optional[datetime], batch_size: int, gzip: bool) -> StreamingResponse:
+    query = {field: {"$gte": since}} if since else {}
+    cursor = collection.find(query, {"_id": 0}).sort([(field, 1), ("id", 1)])
+    chunks = stream_batches(cursor, batch_size)
+    headers = {}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
 
 # CIEL Info endpoints
 @api_router.get("/ciel-info", response_model=CielInfo)
-async def get_ciel_info():
+async def get_ciel_info(request: Request):
     """Get CIEL section information"""
-    ciel_info = await ciel_info_collection.find_one({})
-    if not ciel_info:
-        raise HTTPException(status_code=404, detail="CIEL info not found")
-    return CielInfo(**ciel_info)
+    async def load():
+        ciel_info = await ciel_info_reads.find_one({})
+        if not ciel_info:
+            raise HTTPException(status_code=404, detail="CIEL info not found")
+        return ciel_info_json.dumps(ciel_info)
+    
+    entry = await reference_cache.get_or_load("ciel-info", load)
+    return conditional_response(request, entry, "reference", reference_cache.last_modified)
 
 # Formations endpoints
 @api_router.get("/formations", response_model=List[Formation])
-async def get_formations():
+async def get_formations(request: Request):
     """Get all formations"""
-    formations_cursor = formations_collection.find({})
-    formations = await formations_cursor.to_list(1000)
-    return [Formation(**formation) for formation in formations]
+    async def load():
+        formations_cursor = formation_reads.find({})
+        formations = await formations_cursor.to_list(1000)
+        return formation_json.dumps_many(formations)
+    
+    entry = await reference_cache.get_or_load("formations", load)
+    return conditional_response(request, entry, "reference", reference_cache.last_modified)
 
 @api_router.get("/formations/{level}", response_model=Formation)
-async def get_formation_by_level(level: str):
+async def get_formation_by_level(request: Request, level: str):
     """Get formation by level (BAC_PRO, BTS, MASTER)"""
-    formation = await formations_collection.find_one({"level": level.upper()})
-    if not formation:
-        raise HTTPException(status_code=404, detail="Formation not found")
-    return Formation(**formation)
+    level = level.upper()
+    
+    async def load():
+        formation = await formation_reads.find_one({"level": level})
+        if not formation:
+            raise HTTPException(status_code=404, detail="Formation not found")
+        return formation_json.dumps(formation)
+    
+    entry = await reference_cache.get_or_load(f"formation:{level}", load)
+    return conditional_response(request, entry, "reference", reference_cache.last_modified)
 
 # Health check
 @api_router.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@api_router.get("/metrics/cache")
+async def cache_metrics():
+    """Hit/miss counters of the response caches"""
+    stats = {cache.name: cache.stats() for cache in (reference_cache, article_cache)}
+    stats["compressed"] = compressed_cache.stats()
+    return stats
+
+@api_router.get("/metrics/db")
+async def db_metrics():
+    """Connection pool usage and checkout wait times of this worker"""
+    return mongo.pool_metrics.snapshot()
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -186,8 +763,12 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Outermost, so error and CORS responses are compressed too
+app.add_middleware(CompressionMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -195,12 +776,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
+SEARCH_SYNC_INTERVAL = float(os.environ.get("SEARCH_SYNC_INTERVAL", "30"))
+background_tasks = []
+
 async def startup_db():
-    """Initialize database with seed data"""
+    """Initialize database with seed data and indexes"""
+    await mongo.warm_up(client)
     await seed_database()
+    await reference_cache.invalidate()
     logger.info("Database initialized with seed data")
+    await ensure_indexes()
+    # Articles written before reading times were computed
+    await backfill_reading_stats()
+    if os.environ.get("VERIFY_QUERY_PLANS", "").lower() in ("1", "true"):
+        await verify_query_plans()
+    await search_index.build(articles_collection)
+    await trending_index.build(articles_collection, trending_collection)
+    await related_index.build(articles_collection)
+    if not await facets_collection.estimated_document_count():
+        await rebuild_facets(articles_collection, facets_collection)
+    article_likes.start()
+    comment_likes.start()
+    await event_hub.start()
+    background_tasks.append(asyncio.create_task(sync_search_index()))
+    background_tasks.append(asyncio.create_task(rebuild_trending()))
+
+async def sync_search_index():
+    """Pick up articles created by other workers"""
+    while True:
+        await asyncio.sleep(SEARCH_SYNC_INTERVAL)
+        try:
+            await search_index.sync(articles_collection)
+            await related_index.sync(articles_collection)
+        except Exception:
+            logger.exception("Search index sync failed")
+
+async def rebuild_trending():
+    """Rebase the trending scores and pick up other workers' interactions"""
+    while True:
+        await asyncio.sleep(TRENDING_REBUILD_INTERVAL)
+        try:
+            await trending_index.build(articles_collection, trending_collection)
+        except Exception:
+            logger.exception("Trending rebuild failed")
 
-@app.on_event("shutdown")
 async def shutdown_db_client():
-    pass
\ No newline at end of file
+    """Stop background tasks, drain the like buffers and close the connections"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await article_likes.close()
+    await comment_likes.close()
+    await trending_index.flush(trending_collection)
+    await event_hub.close()
+    mongo.close(client)
\ No newline at end of file
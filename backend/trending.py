@@ -0,0 +1,183 @@
+"""Time-decayed trending ranking of articles.
+
+Every interaction adds a weight that halves every ``TRENDING_HALF_LIFE_HOURS``.
+Decaying every score all the time is avoided with a reference time: a score
+is stored as the sum of ``weight * 2 ** ((t - epoch) / half_life)``, so older
+interactions weigh less without ever being touched, and ordering by the
+stored value is ordering by the decayed score. Values grow as time moves away
+from the epoch; rebuilding moves the epoch to the present (rebasing).
+
+Each worker keeps the ranking in memory as sorted lists, one for all
+articles and one per category, so a page is a slice. Likes and comments move
+an article in place and are accumulated as deltas that are flushed to the
+``trending`` collection with one bulk_write. Snapshot documents carry their
+own epoch and every flush rescales them to the flushing worker's epoch in the
+same update, so workers with different epochs can write to the same
+document. ``build`` reloads the ranking from the articles and the snapshot,
+which also brings in the interactions recorded by other workers.
+"""
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_REBUILD_INTERVAL = float(os.environ.get("TRENDING_REBUILD_INTERVAL", "60"))
+# Weight of each event; publishing gives new articles a head start
+TRENDING_PUBLISH_WEIGHT = float(os.environ.get("TRENDING_PUBLISH_WEIGHT", "10"))
+TRENDING_LIKE_WEIGHT = float(os.environ.get("TRENDING_LIKE_WEIGHT", "1"))
+TRENDING_COMMENT_WEIGHT = float(os.environ.get("TRENDING_COMMENT_WEIGHT", "3"))
+
+# Ranking entry: (-score, article id), so ascending order is best first
+Entry = Tuple[float, str]
+
+
+class TrendingIndex:
+    """Decayed scores per article, ranked overall and per category"""
+
+    def __init__(self, half_life_hours: float = TRENDING_HALF_LIFE_HOURS):
+        self.half_life = half_life_hours * 3600
+        self.epoch = time.time()
+        self._scores: Dict[str, float] = {}
+        self._categories: Dict[str, str] = {}
+        self._rankings: Dict[Optional[str], List[Entry]] = {None: []}
+        # Deltas relative to ``epoch`` not written to the snapshot yet
+        self._pending: Dict[str, float] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _decayed(self, weight: float, at: float) -> float:
+        return weight * 2 ** ((at - self.epoch) / self.half_life)
+
+    def _place(self, article_id: str, score: float):
+        previous = self._scores.get(article_id)
+        self._scores[article_id] = score
+        for key in (None, self._categories[article_id]):
+            ranking = self._rankings.setdefault(key, [])
+            if previous is not None:
+                del ranking[bisect_left(ranking, (-previous, article_id))]
+            insort(ranking, (-score, article_id))
+
+    def add(self, article: dict):
+        """Rank a new article, scored for its publication"""
+        if article["id"] in self._scores:
+            return
+        self._categories[article["id"]] = article["category"]
+        self._place(article["id"], self._decayed(TRENDING_PUBLISH_WEIGHT, _timestamp(article["published_at"])))
+
+    def record(self, article_id: str, weight: float):
+        """Add an interaction happening now"""
+        delta = self._decayed(weight, time.time())
+        self._pending[article_id] = self._pending.get(article_id, 0.0) + delta
+        # Articles created by another worker are ranked at the next build
+        if article_id in self._scores:
+            self._place(article_id, self._scores[article_id] + delta)
+
+    def liked(self, article_id: str):
+        self.record(article_id, TRENDING_LIKE_WEIGHT)
+
+    def commented(self, article_id: str):
+        self.record(article_id, TRENDING_COMMENT_WEIGHT)
+
+    def page(self, category: Optional[str], limit: int, skip: int = 0,
+             after: Optional[Tuple[list, str]] = None,
+             only: Optional[Set[str]] = None) -> Tuple[int, List[Tuple[list, str]]]:
+        """Return ``(total, [(cursor value, article id)])`` best first
+
+        ``after`` is the ``(cursor value, id)`` of the last item already
+        returned, ``only`` restricts the ranking to a set of ids (search
+        results, at the cost of a pass over the ranking).
+        """
+        ranking = self._rankings.get(category, [])
+        if only is not None:
+            ranking = [entry for entry in ranking if entry[1] in only]
+        start = skip
+        if after is not None:
+            (epoch, key), after_id = after
+            if epoch != self.epoch:
+                # Issued before a rebase: continue after the article's current
+                # place, or convert its score when it is not ranked anymore
+                if after_id in self._scores:
+                    key = -self._scores[after_id]
+                else:
+                    # Bounded, so that a forged epoch cannot overflow the float
+                    key *= 2 ** max(-1000.0, min(1000.0, (epoch - self.epoch) / self.half_life))
+            start = bisect_right(ranking, (key, after_id))
+        entries = ranking[start:start + limit]
+        return len(ranking), [([self.epoch, key], article_id) for key, article_id in entries]
+
+    async def flush(self, collection):
+        """Add the pending deltas to the snapshot"""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            epoch = self.epoch
+            # Rescale the stored score from the document's epoch to ours
+            rescale = {"$pow": [2, {"$divide": [
+                {"$subtract": [{"$ifNull": ["$epoch", epoch]}, epoch]}, self.half_life
+            ]}]}
+            try:
+                await collection.bulk_write([
+                    UpdateOne({"id": article_id}, [{"$set": {
+                        "score": {"$add": [{"$multiply": [{"$ifNull": ["$score", 0]}, rescale]}, delta]},
+                        "epoch": epoch
+                    }}], upsert=True)
+                    for article_id, delta in pending.items()
+                ], ordered=False)
+            except Exception:
+                # Keep the deltas for the next flush
+                for article_id, delta in pending.items():
+                    self._pending[article_id] = self._pending.get(article_id, 0.0) + delta
+                raise
+
+    async def build(self, articles_collection, collection):
+        """Flush, then rebuild every ranking from the articles and the snapshot at a new epoch"""
+        await self.flush(collection)
+        async with self._flush_lock:
+            epoch = time.time()
+            scores: Dict[str, float] = {}
+            categories: Dict[str, str] = {}
+            async for article in articles_collection.find({}, {"_id": 0, "id": 1, "category": 1, "published_at": 1}):
+                categories[article["id"]] = article["category"]
+                age = _timestamp(article["published_at"]) - epoch
+                scores[article["id"]] = TRENDING_PUBLISH_WEIGHT * 2 ** (age / self.half_life)
+            async for snapshot in collection.find({}, {"_id": 0}):
+                if snapshot["id"] in scores:
+                    scores[snapshot["id"]] += snapshot["score"] * 2 ** ((snapshot["epoch"] - epoch) / self.half_life)
+
+            rankings: Dict[Optional[str], List[Entry]] = {None: []}
+            for article_id, score in scores.items():
+                rankings[None].append((-score, article_id))
+                rankings.setdefault(categories[article_id], []).append((-score, article_id))
+            for ranking in rankings.values():
+                ranking.sort()
+
+            # Deltas recorded during the build are relative to the old epoch
+            rebase = 2 ** ((self.epoch - epoch) / self.half_life)
+            for article_id, delta in list(self._pending.items()):
+                self._pending[article_id] = delta * rebase
+            self.epoch = epoch
+            self._scores, self._categories, self._rankings = scores, categories, rankings
+            for article_id, delta in self._pending.items():
+                if article_id in self._scores:
+                    self._place(article_id, self._scores[article_id] + delta)
+        logger.info("Trending ranking built with %d articles", len(scores))
+
+def _timestamp(value: datetime) -> float:
+    # Stored datetimes are naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+trending_index = TrendingIndex()
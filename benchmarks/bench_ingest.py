@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Bulk ingest throughput and event-loop stalls.
+
+Seeds a database like the load test (``--mongo-url`` or the in-memory
+stand-in) with ``--articles`` articles, then feeds ``--documents`` new ones
+as NDJSON through ``ingest_articles`` with the handler of
+``POST /api/articles/bulk`` (search and trending indexes, facets, caches;
+related articles are scored later by the periodic sync), and reports the documents ingested per second. A ticker coroutine
+runs meanwhile and records how late it wakes up: that is how long other
+requests would wait while a chunk is validated, written and indexed.
+
+Against the in-memory stand-in the article writes are discarded: mongomock
+scans the collection for every unique index on each insert, which would
+only measure mongomock. Pass ``--mongo-url`` to include real writes; the
+in-memory numbers only cover the in-process work (see ``load_test``).
+
+Usage: python benchmarks/bench_ingest.py [--articles 2000] [--documents 3000] [--mongo-url URL]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+from pymongo.results import InsertManyResult
+
+from corpus import make_corpus
+from load_test import configure_backend, seed
+
+INGESTED_FIELDS = ("title", "excerpt", "content", "author", "category", "tags")
+TICK = 0.005
+
+
+async def ticker(lags: list):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+class DiscardingCollection:
+    """Accepts article writes without storing them"""
+
+    async def insert_many(self, documents, ordered=True):
+        return InsertManyResult([None] * len(documents), True)
+
+
+async def body_chunks(articles, size=64 * 1024):
+    body = b"".join(
+        json.dumps({field: article[field] for field in INGESTED_FIELDS}).encode() + b"\n"
+        for article in articles
+    )
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def run(args, backend: str):
+    import server
+    from ingest import ingest_articles, iter_ndjson
+
+    await seed(args.articles, 0, seed=1)
+    new_articles, _ = make_corpus(args.documents, seed=2)
+    collection = server.articles_collection if backend == "mongod" else DiscardingCollection()
+
+    async with server.app.router.lifespan_context(server.app):
+        lags: list = []
+        ticks = asyncio.create_task(ticker(lags))
+        started = time.perf_counter()
+        result = await ingest_articles(iter_ndjson(body_chunks(new_articles)), collection, server._articles_ingested)
+        elapsed = time.perf_counter() - started
+        ticks.cancel()
+
+    lags_ms = np.asarray(lags or [0.0]) * 1000
+    print(f"existing articles  {args.articles}")
+    print(f"ingested           {result.inserted} ({result.failed} errors)")
+    print(f"elapsed            {elapsed:.2f} s")
+    print(f"throughput         {result.inserted / elapsed:.0f} docs/s")
+    print(f"loop lag p50/p99   {np.percentile(lags_ms, 50):.1f} / {np.percentile(lags_ms, 99):.1f} ms")
+    print(f"loop lag max       {lags_ms.max():.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=2000, help="articles already in the database")
+    parser.add_argument("--documents", type=int, default=3000, help="articles to ingest")
+    parser.add_argument("--mongo-url", help="local mongod to use instead of the in-memory database")
+    parser.add_argument("--db-name", default="ciel_blog_bench", help="database to drop and reseed")
+    args = parser.parse_args()
+    backend = configure_backend(args.mongo_url, args.db_name)
+    asyncio.run(run(args, backend))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Bytes per page and build cost of full vs summary article listings.
+
+Usage: python benchmarks/bench_list_payload.py [--articles 200] [--repeat 200]
+"""
+import argparse
+import timeit
+from typing import List
+
+from corpus import make_corpus
+
+from models import Article, ArticleSummary, ArticlesResponse
+
+SUMMARY_FIELDS = tuple(ArticleSummary.model_fields)
+
+
+class FullArticlesResponse(ArticlesResponse):
+    """Listing shape before summaries: every item carries its markdown body"""
+    articles: List[Article]
+
+
+def full_page(docs):
+    articles = [Article(**doc) for doc in docs]
+    return FullArticlesResponse(articles=articles, total=len(docs), page=1, limit=len(docs))
+
+
+def summary_page(docs):
+    # What the Mongo projection hands to the listing endpoint
+    projected = [{field: doc[field] for field in SUMMARY_FIELDS} for doc in docs]
+    articles = [ArticleSummary(**doc) for doc in projected]
+    return ArticlesResponse(articles=articles, total=len(docs), page=1, limit=len(docs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    articles, _ = make_corpus(args.articles)
+    print(f"{'limit':>5} {'variant':>8} {'bytes/page':>11} {'us/page':>9}")
+    for limit in (10, 50):
+        docs = articles[:limit]
+        for name, build in (("full", full_page), ("summary", summary_page)):
+            body = build(docs).model_dump_json().encode()
+            seconds = timeit.timeit(lambda: build(docs).model_dump_json(), number=args.repeat)
+            print(f"{limit:>5} {name:>8} {len(body):>11} {seconds / args.repeat * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
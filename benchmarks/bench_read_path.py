@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Per-document cost of encoding stored documents for the read handlers.
+
+Compares validating a model from each document (``Model(**doc)``), building
+it without validation (``model_construct``) and encoding the document
+directly with the serializer's field map, for the models served by the read
+routes.
+
+Usage: python benchmarks/bench_read_path.py [--documents 200] [--repeat 50]
+"""
+import argparse
+import timeit
+
+from bson import ObjectId
+
+from corpus import make_corpus
+
+from models import Article, ArticleSummary, Comment
+from reading import reading_stats
+from serializers import DocumentSerializer
+
+
+def as_stored(document):
+    # What Motor returns: the document with its ObjectId
+    return {"_id": ObjectId(), **document}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    articles, comments = make_corpus(args.documents, comments_per_article=1)
+    articles = [as_stored({**article, **reading_stats(article["content"])}) for article in articles]
+    # Listings project the summary fields, without _id
+    summaries = [{field: article[field] for field in ArticleSummary.model_fields} for article in articles]
+    comments = [as_stored(comment) for comment in comments]
+
+    cases = [("Article", Article, articles), ("ArticleSummary", ArticleSummary, summaries),
+             ("Comment", Comment, comments)]
+    print(f"{'model':<15} {'path':<16} {'us/doc':>8}")
+    for name, model, documents in cases:
+        serializer = DocumentSerializer(model)
+        paths = {
+            "validate": lambda: [model(**document).model_dump_json() for document in documents],
+            "model_construct": lambda: [model.model_construct(**document).model_dump_json() for document in documents],
+            "field map": lambda: [serializer.dumps(document) for document in documents],
+        }
+        for path, run in paths.items():
+            seconds = timeit.timeit(run, number=args.repeat)
+            print(f"{name:<15} {path:<16} {seconds / args.repeat / len(documents) * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
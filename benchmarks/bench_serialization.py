@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Serialization CPU and bytes on the wire for get_articles and get_comments pages.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+orjson response class, then the compressed sizes and the cost of compressing
+a body versus serving it from the compressed cache.
+
+Usage: python benchmarks/bench_serialization.py [--repeat 200]
+"""
+import argparse
+import timeit
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from corpus import make_corpus
+
+from compression import ENCODERS, CompressedCache
+from models import ArticleSummary, ArticlesResponse, Comment
+
+SUMMARY_FIELDS = tuple(ArticleSummary.model_fields)
+
+
+def payloads():
+    articles, comments = make_corpus(50, comments_per_article=4)
+    summaries = [ArticleSummary(**{field: doc.get(field, 0) for field in SUMMARY_FIELDS}) for doc in articles]
+    page = ArticlesResponse(articles=summaries, total=len(articles), page=1, limit=len(articles))
+    thread = [Comment(**comment) for comment in comments]
+    return [
+        ("get_articles (50)", TypeAdapter(ArticlesResponse), page),
+        ("get_comments (200)", TypeAdapter(List[Comment]), thread),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    def us(func):
+        return timeit.timeit(func, number=args.repeat) / args.repeat * 1e6
+
+    print(f"{'payload':<20} {'variant':<16} {'bytes':>8} {'us':>9}")
+    for name, adapter, value in payloads():
+        # Before: what FastAPI does for a route returning a model with JSONResponse
+        def before():
+            return JSONResponse(jsonable_encoder(value)).body
+
+        # After: response_model serialization in pydantic-core, then orjson
+        def after():
+            return ORJSONResponse(adapter.dump_python(value, mode="json")).body
+
+        body = after()
+        print(f"{name:<20} {'json (before)':<16} {len(before()):>8} {us(before):>9.1f}")
+        print(f"{name:<20} {'orjson':<16} {len(body):>8} {us(after):>9.1f}")
+        for encoding, encode in ENCODERS.items():
+            cache = CompressedCache()
+            key = ("/bench", '"etag"', encoding)
+            compressed = cache.get_or_compress(key, body)
+            print(f"{name:<20} {encoding:<16} {len(compressed):>8} {us(lambda: encode(body)):>9.1f}")
+            print(f"{name:<20} {encoding + ' cached':<16} {len(compressed):>8} "
+                  f"{us(lambda: cache.get_or_compress(key, body)):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Synthetic articles and comments shaped like the seeded blog data."""
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from reading import reading_stats  # noqa: E402
+
+CATEGORIES = ["Menaces", "Architecture", "Cryptographie", "Réseaux", "Forensique"]
+TAGS = ["Cybersécurité", "IA", "Ransomware", "IoT", "Zero Trust", "Réseaux", "Quantique",
+        "RSA", "Post-quantique", "SOC", "Pentest", "Cloud", "RGPD", "Malware"]
+WORDS = ("sécurité réseau attaque chiffrement vulnérabilité système données protection "
+         "menace audit infrastructure authentification surveillance incident analyse "
+         "serveur pare-feu cryptographie identité accès politique conformité").split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_markdown(rng, paragraphs=12):
+    """Markdown body with headings, paragraphs and lists (~4 KB by default)"""
+    lines = [f"# {_sentence(rng, 6)}", ""]
+    for index in range(paragraphs):
+        if index % 4 == 0:
+            lines += [f"## {_sentence(rng, 4)}", ""]
+        lines += [" ".join(_sentence(rng) for _ in range(3)), ""]
+        if index % 3 == 0:
+            lines += [f"- {_sentence(rng, 5)}" for _ in range(4)] + [""]
+    return "\n".join(lines)
+
+
+def make_article(rng, index, start=datetime(2024, 1, 1)):
+    now = datetime.utcnow()
+    content = make_markdown(rng)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "title": _sentence(rng, 7)[:-1],
+        "excerpt": _sentence(rng, 20),
+        "content": content,
+        "author": rng.choice(["Dr. Marie Dubois", "Thomas Martin", "Prof. Antoine Leroy"]),
+        "published_at": start + timedelta(hours=index),
+        "category": rng.choice(CATEGORIES),
+        "tags": rng.sample(TAGS, 4),
+        **reading_stats(content),
+        "likes": rng.randint(0, 500),
+        "comment_count": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def make_comment(rng, article, index):
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "article_id": article["id"],
+        "author": rng.choice(["Alex Cyber", "Sandra Tech", "Mike Security", "Lisa Network"]),
+        "content": _sentence(rng, 25),
+        "published_at": article["published_at"] + timedelta(minutes=index),
+        "likes": rng.randint(0, 20),
+    }
+
+
+def make_corpus(n_articles, comments_per_article=0, seed=42):
+    """Return (articles, comments) with comment_count kept consistent"""
+    rng = random.Random(seed)
+    articles, comments = [], []
+    for index in range(n_articles):
+        article = make_article(rng, index)
+        for comment_index in range(comments_per_article):
+            comments.append(make_comment(rng, article, comment_index))
+        article["comment_count"] = comments_per_article
+        articles.append(article)
+    return articles, comments
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Load test of the API: mixed workload, RPS and latency percentiles per endpoint.
+
+The FastAPI app runs in this process against a local mongod (``--mongo-url``,
+the ``--db-name`` database is dropped and reseeded) or, by default, an
+in-memory stand-in (mongomock-motor). The database is seeded with the
+reference data and a synthetic corpus of ``--articles`` articles with
+``--comments`` comments each. Worker coroutines then issue requests drawn
+from ``WORKLOAD`` through an in-process ASGI client for ``--duration``
+seconds, after a warm-up. Popular articles get most of the traffic.
+
+The in-memory stand-in ignores indexes (every query scans the collection)
+and ``to_list`` length limits, and costs no network round trip: its numbers
+only compare code paths run in process and say nothing about latency
+against a real MongoDB. Measure with ``--mongo-url`` for that. Install the
+benchmark dependencies with ``pip install -r requirements-dev.txt``.
+
+Each run prints RPS and p50/p95/p99 per endpoint and saves them as JSON
+(under ``benchmarks/results/`` by default) with the commit it ran on.
+``compare`` diffs two results and exits with status 1 when an endpoint lost
+more than ``--threshold`` percent of throughput or p95 latency. Latencies
+include the in-process client, so only compare runs made the same way on
+the same machine.
+
+Usage:
+    python benchmarks/load_test.py run [--articles 500] [--comments 10] [--concurrency 32]
+                                       [--duration 20] [--mongo-url URL] [--compare BASELINE]
+    python benchmarks/load_test.py compare BASELINE RESULT [--threshold 10]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from corpus import CATEGORIES, WORDS, make_corpus
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Request kind -> share of the traffic; reads dominate, as on the blog
+WORKLOAD = {
+    "list_recent": 25,
+    "list_filtered": 10,
+    "search": 8,
+    "get_article": 15,
+    "get_article_html": 10,
+    "get_comments": 12,
+    "related": 6,
+    "facets": 4,
+    "like_article": 6,
+    "create_comment": 2,
+    "like_comment": 2,
+}
+
+INSERT_BATCH_SIZE = 1000
+
+
+def configure_backend(mongo_url: Optional[str], db_name: str) -> str:
+    """Point the backend at the load test database, before it is imported"""
+    os.environ["DB_NAME"] = db_name
+    # The backend logs at INFO, which would log every request of the client
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if mongo_url:
+        os.environ["MONGO_URL"] = mongo_url
+        return "mongod"
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("The in-memory database requires mongomock-motor (pip install -r requirements-dev.txt), "
+                 "or pass --mongo-url")
+    import motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    os.environ["MONGO_URL"] = "mongodb://localhost:27017"
+    # No replica set: no secondaries to route to, no transactions
+    os.environ["READ_REPLICA_PREFERENCE"] = "primary"
+    import database
+    database._transactions_supported = False
+    return "memory"
+
+
+async def seed(n_articles: int, n_comments: int, seed: int):
+    """Reseed the database: reference data, then the synthetic corpus"""
+    import database
+    from render import render_article
+
+    await database.client.drop_database(database.db.name)
+    await database.seed_database()
+    articles, comments = make_corpus(n_articles, n_comments, seed=seed)
+    for article in articles:
+        article.update(render_article(article["content"]))
+    for collection, documents in ((database.articles_collection, articles),
+                                  (database.comments_collection, comments)):
+        for start in range(0, len(documents), INSERT_BATCH_SIZE):
+            # insert_many adds _id to the dicts, keep the corpus clean
+            await collection.insert_many([dict(document) for document in documents[start:start + INSERT_BATCH_SIZE]])
+    return articles, comments
+
+
+class Recorder:
+    """Latencies and errors per endpoint, of the requests started after ``start``"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, started: float, ended: float, ok: bool):
+        if started < self.start:
+            return
+        self.latencies[endpoint].append(ended - started)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+class Workload:
+    """One request of each kind in ``WORKLOAD``, on random but skewed targets"""
+
+    def __init__(self, client: httpx.AsyncClient, article_ids: List[str], comment_ids: List[str], rng: random.Random):
+        self.client = client
+        self.article_ids = article_ids
+        self.comment_ids = comment_ids
+        self.rng = rng
+
+    def _article(self) -> str:
+        # Pareto-distributed rank: a few articles get most of the reads
+        rank = int(self.rng.paretovariate(1.2)) - 1
+        return self.article_ids[min(rank, len(self.article_ids) - 1)]
+
+    async def list_recent(self):
+        return await self.client.get("/api/articles", params={"page": self.rng.choice([1, 1, 1, 2, 3]), "limit": 10})
+
+    async def list_filtered(self):
+        return await self.client.get("/api/articles", params={
+            "category": self.rng.choice(CATEGORIES),
+            "sort": self.rng.choice(["popular", "comments", "trending", "read_time"]),
+            "limit": 10,
+        })
+
+    async def search(self):
+        return await self.client.get("/api/articles", params={"search": self.rng.choice(WORDS), "sort": "relevance"})
+
+    async def get_article(self):
+        return await self.client.get(f"/api/articles/{self._article()}")
+
+    async def get_article_html(self):
+        return await self.client.get(f"/api/articles/{self._article()}", params={"format": "html"})
+
+    async def get_comments(self):
+        return await self.client.get(f"/api/articles/{self._article()}/comments", params={"limit": 50})
+
+    async def related(self):
+        return await self.client.get(f"/api/articles/{self._article()}/related")
+
+    async def facets(self):
+        return await self.client.get("/api/facets")
+
+    async def like_article(self):
+        return await self.client.post(f"/api/articles/{self._article()}/like")
+
+    async def create_comment(self):
+        return await self.client.post(f"/api/articles/{self._article()}/comments", json={
+            "author": "Load Test", "content": " ".join(self.rng.choices(WORDS, k=20)),
+        })
+
+    async def like_comment(self):
+        return await self.client.post(f"/api/comments/{self.rng.choice(self.comment_ids)}/like")
+
+
+async def worker(workload: Workload, recorder: Recorder, deadline: float, rng: random.Random):
+    endpoints, weights = list(WORKLOAD), list(WORKLOAD.values())
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await getattr(workload, endpoint)()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(endpoint, started, time.perf_counter(), ok)
+        # In-process requests may complete without suspending; let the other clients in
+        await asyncio.sleep(0)
+
+
+def _stats(seconds: List[float], errors: int, elapsed: float) -> Dict:
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 1),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict:
+    endpoints = {
+        endpoint: _stats(samples, recorder.errors[endpoint], elapsed)
+        for endpoint, samples in sorted(recorder.latencies.items())
+    }
+    every_sample = [sample for samples in recorder.latencies.values() for sample in samples]
+    total = _stats(every_sample, sum(recorder.errors.values()), elapsed) if every_sample else {}
+    return {"elapsed_s": round(elapsed, 3), "endpoints": endpoints, "total": total}
+
+
+async def run_load(args, backend: str) -> Dict:
+    import server
+
+    articles, comments = await seed(args.articles, args.comments, args.seed)
+    # Most liked first, so the skewed picks hit the articles the listings show
+    article_ids = [article["id"] for article in sorted(articles, key=lambda article: -article["likes"])]
+    comment_ids = [comment["id"] for comment in comments] or ["1"]
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            rng = random.Random(args.seed)
+            workload = Workload(client, article_ids, comment_ids, rng)
+            # Requests started during the warm-up are not recorded
+            recorder = Recorder(time.perf_counter() + args.warmup)
+            deadline = recorder.start + args.duration
+            await asyncio.gather(*(
+                worker(workload, recorder, deadline, random.Random(rng.random()))
+                for _ in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - recorder.start
+    return summarize(recorder, elapsed)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+MEMORY_BACKEND_NOTE = ("In-memory database (mongomock): no indexes, no to_list limits, no network; "
+                       "these numbers say nothing about MongoDB latency, use --mongo-url for that")
+
+
+def print_report(result: Dict):
+    if result["meta"]["backend"] == "memory":
+        print(MEMORY_BACKEND_NOTE)
+    header = f"{'endpoint':<18} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for endpoint, stats in rows:
+        print(f"{endpoint:<18} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(baseline: Dict, result: Dict, threshold: float) -> List[str]:
+    """Print the changes per endpoint and return the regressed endpoints"""
+    print(f"Baseline {baseline['meta'].get('commit')} vs {result['meta'].get('commit')}")
+    backends = {baseline["meta"].get("backend"), result["meta"].get("backend")}
+    if len(backends) > 1:
+        print("Warning: the runs used different databases, the comparison is meaningless")
+    elif "memory" in backends:
+        print(MEMORY_BACKEND_NOTE)
+    header = f"{'endpoint':<18} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}"
+    print(header)
+    print("-" * len(header))
+    regressions = []
+    endpoints = [name for name in result["endpoints"] if name in baseline["endpoints"]] + ["total"]
+    for endpoint in endpoints:
+        old = baseline["total"] if endpoint == "total" else baseline["endpoints"][endpoint]
+        new = result["total"] if endpoint == "total" else result["endpoints"][endpoint]
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            cells.append(f"{new[key]:>8.1f} {_change(old[key], new[key]):>+6.1f}%")
+        regressed = _change(old["rps"], new["rps"]) < -threshold or _change(old["p95_ms"], new["p95_ms"]) > threshold
+        if regressed:
+            regressions.append(endpoint)
+        print(f"{endpoint:<18} " + "  ".join(cells) + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def cmd_run(args) -> int:
+    backend = configure_backend(args.mongo_url, args.db_name)
+    result = asyncio.run(run_load(args, backend))
+    result["meta"] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "backend": backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "articles": args.articles,
+        "comments_per_article": args.comments,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "seed": args.seed,
+        "workload": WORKLOAD,
+    }
+    if backend == "memory":
+        result["meta"]["note"] = MEMORY_BACKEND_NOTE
+    print_report(result)
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"load-{result['meta']['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        return 1 if compare(baseline, result, args.threshold) else 0
+    return 0
+
+
+def cmd_compare(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    result = json.loads(Path(args.result).read_text())
+    return 1 if compare(baseline, result, args.threshold) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="seed a database, drive the workload and save the results")
+    run.add_argument("--articles", type=int, default=500, help="synthetic articles (default: 500)")
+    run.add_argument("--comments", type=int, default=10, help="comments per article (default: 10)")
+    run.add_argument("--concurrency", type=int, default=32, help="concurrent clients (default: 32)")
+    run.add_argument("--duration", type=float, default=20, help="measured seconds (default: 20)")
+    run.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first (default: 3)")
+    run.add_argument("--seed", type=int, default=42, help="corpus and workload random seed")
+    run.add_argument("--mongo-url", help="local mongod to use instead of the in-memory database")
+    run.add_argument("--db-name", default="ciel_blog_loadtest", help="database to drop and reseed")
+    run.add_argument("--output", help="result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    run.add_argument("--compare", metavar="BASELINE", help="compare with a previous result file")
+    run.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (default: 10)")
+    run.set_defaults(handler=cmd_run)
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("baseline")
+    diff.add_argument("result")
+    diff.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (default: 10)")
+    diff.set_defaults(handler=cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { ArrowLeft, Calendar, Clock, Heart, MessageCircle, User, Send, Tag } from 'lucide-react';
-import { articlesAPI, commentsAPI } from '../services/api';
+import { articlesAPI, commentsAPI, articleEventsURL } from '../services/api';
+
+const COMMENTS_PAGE_SIZE = 20;
 
 const ArticlePage = () => {
   const { id } = useParams();
   const [article, setArticle] = useState(null);
   const [comments, setComments] = useState([]);
+  const [commentsCursor, setCommentsCursor] = useState(null);
+  const [loadingComments, setLoadingComments] = useState(false);
   const [relatedArticles, setRelatedArticles] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -18,23 +22,50 @@ const ArticlePage = () => {
     loadArticleAndComments();
   }, [id]);
 
+  // Live updates instead of polling
+  useEffect(() => {
+    const source = new EventSource(articleEventsURL(id));
+
+    source.addEventListener('likes', (e) => {
+      const event = JSON.parse(e.data);
+      if (event.likes !== undefined) {
+        setArticle(prev => prev && { ...prev, likes: event.likes });
+      }
+      setComments(prev =>
+        prev.map(comment =>
+          comment.id in event.comments
+            ? { ...comment, likes: event.comments[comment.id] }
+            : comment
+        )
+      );
+    });
+
+    source.addEventListener('comment', (e) => {
+      const event = JSON.parse(e.data);
+      setArticle(prev => prev && { ...prev, comment_count: event.comment_count });
+      setComments(prev =>
+        prev.some(comment => comment.id === event.comment.id) ? prev : [...prev, event.comment]
+      );
+    });
+
+    return () => source.close();
+  }, [id]);
+
   const loadArticleAndComments = async () => {
     try {
       setLoading(true);
       const [articleResponse, commentsResponse] = await Promise.all([
-        articlesAPI.getById(id),
-        commentsAPI.getByArticle(id)
+        articlesAPI.getById(id, { format: 'html' }),
+        commentsAPI.getByArticle(id, { limit: COMMENTS_PAGE_SIZE })
       ]);
       
       setArticle(articleResponse.data);
       setComments(commentsResponse.data);
+      setCommentsCursor(commentsResponse.headers['x-next-cursor'] || null);
       
       // Load related articles
-      const relatedResponse = await articlesAPI.getAll({
-        category: articleResponse.data.category,
-        limit: 4
-      });
-      setRelatedArticles(relatedResponse.data.articles.filter(a => a.id !== id));
+      const relatedResponse = await articlesAPI.getRelated(id, { limit: 3 });
+      setRelatedArticles(relatedResponse.data);
       
       setError(null);
     } catch (err) {
@@ -51,14 +82,16 @@ const ArticlePage = () => {
 
     try {
       setSubmittingComment(true);
-      await commentsAPI.create(id, {
+      const response = await commentsAPI.create(id, {
         author: userName.trim(),
         content: newComment.trim()
       });
       
-      // Reload comments
-      const commentsResponse = await commentsAPI.getByArticle(id);
-      setComments(commentsResponse.data);
+      // Show the created comment; reading the thread back could hit a
+      // replica that has not seen it yet
+      setComments(prev =>
+        prev.some(comment => comment.id === response.data.id) ? prev : [...prev, response.data]
+      );
       
       // Clear form
       setNewComment('');
@@ -71,6 +104,28 @@ const ArticlePage = () => {
     }
   };
 
+  const loadMoreComments = async () => {
+    if (!commentsCursor || loadingComments) return;
+
+    try {
+      setLoadingComments(true);
+      const response = await commentsAPI.getByArticle(id, {
+        limit: COMMENTS_PAGE_SIZE,
+        cursor: commentsCursor
+      });
+      // Comments pushed live may already be shown
+      setComments(prev => [
+        ...prev,
+        ...response.data.filter(comment => !prev.some(shown => shown.id === comment.id))
+      ]);
+      setCommentsCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      console.error('Error loading comments:', err);
+    } finally {
+      setLoadingComments(false);
+    }
+  };
+
   const handleLikeArticle = async () => {
     try {
       const response = await articlesAPI.like(id);
@@ -137,44 +192,6 @@ const ArticlePage = () => {
     });
   };
 
-  // Parse article content for basic markdown-like formatting
-  const formatContent = (content) => {
-    return content.split('\n').map((paragraph, index) => {
-      if (paragraph.startsWith('# ')) {
-        return (
-          <h1 key={index} className="display-medium" style={{ margin: '40px 0 20px', color: 'var(--text-primary)' }}>
-            {paragraph.substring(2)}
-          </h1>
-        );
-      } else if (paragraph.startsWith('## ')) {
-        return (
-          <h2 key={index} className="heading-1" style={{ margin: '32px 0 16px', color: 'var(--text-primary)' }}>
-            {paragraph.substring(3)}
-          </h2>
-        );
-      } else if (paragraph.startsWith('### ')) {
-        return (
-          <h3 key={index} className="heading-2" style={{ margin: '24px 0 12px', color: 'var(--text-primary)' }}>
-            {paragraph.substring(4)}
-          </h3>
-        );
-      } else if (paragraph.startsWith('- ')) {
-        return (
-          <li key={index} className="body-medium" style={{ margin: '8px 0', color: 'var(--text-secondary)', marginLeft: '20px' }}>
-            {paragraph.substring(2)}
-          </li>
-        );
-      } else if (paragraph.trim()) {
-        return (
-          <p key={index} className="body-medium" style={{ margin: '16px 0', color: 'var(--text-secondary)', lineHeight: '1.7' }}>
-            {paragraph}
-          </p>
-        );
-      }
-      return null;
-    });
-  };
-
   return (
     <div className="dark-container">
       <div className="dark-content-container">
@@ -259,16 +276,19 @@ const ArticlePage = () => {
                 <div style={{ display: 'flex', alignItems: 'center', gap: '8px' }}>
                   <Clock size={16} style={{ color: 'var(--text-muted)' }} />
                   <span className="body-small" style={{ color: 'var(--text-muted)' }}>
-                    {article.readTime}
+                    {article.read_time}
                   </span>
                 </div>
               </div>
             </header>
 
             {/* Article Content */}
-            <div style={{ marginBottom: '60px' }}>
-              {formatContent(article.content)}
-            </div>
+            {/* Rendered and sanitized by the server */}
+            <div
+              className="article-body"
+              style={{ marginBottom: '60px' }}
+              dangerouslySetInnerHTML={{ __html: article.content_html }}
+            />
 
             {/* Tags */}
             <div style={{
@@ -310,7 +330,7 @@ const ArticlePage = () => {
                   padding: '4px 12px',
                   borderRadius: '0px'
                 }}>
-                  {comments.length}
+                  {article.comment_count ?? comments.length}
                 </span>
               </div>
 
@@ -415,6 +435,18 @@ const ArticlePage = () => {
                   </div>
                 ))}
               </div>
+
+              {commentsCursor && (
+                <div style={{ display: 'flex', justifyContent: 'center', marginTop: '32px' }}>
+                  <button
+                    className="btn-secondary"
+                    onClick={loadMoreComments}
+                    disabled={loadingComments}
+                  >
+                    {loadingComments ? 'Chargement...' : 'Voir plus de commentaires'}
+                  </button>
+                </div>
+              )}
             </section>
           </article>
 
@@ -450,7 +482,7 @@ const ArticlePage = () => {
                     <span className="body-medium">Commentaires</span>
                   </div>
                   <span className="body-medium" style={{ color: 'var(--brand-primary)' }}>
-                    {comments.length}
+                    {article.comment_count ?? comments.length}
                   </span>
                 </div>
                 
@@ -460,7 +492,7 @@ const ArticlePage = () => {
                     <span className="body-medium">Lecture</span>
                   </div>
                   <span className="body-medium" style={{ color: 'var(--brand-primary)' }}>
-                    {article.readTime}
+                    {article.read_time}
                   </span>
                 </div>
               </div>
@@ -517,6 +549,50 @@ const ArticlePage = () => {
           background: var(--brand-hover) !important;
           border-color: var(--brand-primary) !important;
         }
+        
+        .article-body h1,
+        .article-body h2,
+        .article-body h3 {
+          color: var(--text-primary);
+        }
+        
+        .article-body h1 {
+          font-size: 32px;
+          font-weight: 600;
+          margin: 40px 0 20px;
+        }
+        
+        .article-body h2 {
+          font-size: 28px;
+          font-weight: 600;
+          margin: 32px 0 16px;
+        }
+        
+        .article-body h3 {
+          font-size: 24px;
+          font-weight: 600;
+          margin: 24px 0 12px;
+        }
+        
+        .article-body p,
+        .article-body li {
+          font-size: 18px;
+          color: var(--text-secondary);
+        }
+        
+        .article-body p {
+          margin: 16px 0;
+          line-height: 1.7;
+        }
+        
+        .article-body li {
+          margin: 8px 0;
+        }
+        
+        .article-body ul,
+        .article-body ol {
+          padding-left: 20px;
+        }
       `}</style>
     </div>
   );
@@ -216,6 +216,7 @@ const BlogPage = () => {
               <option value="recent">Plus récents</option>
               <option value="popular">Plus populaires</option>
               <option value="comments">Plus commentés</option>
+              <option value="read_time">Lecture la plus courte</option>
             </select>
           </div>
         </section>
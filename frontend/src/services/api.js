@@ -33,8 +33,12 @@ export const articlesAPI = {
     return apiClient.get('/articles', { params });
   },
   
-  getById: (id) => {
-    return apiClient.get(`/articles/${id}`);
+  getById: (id, params = {}) => {
+    return apiClient.get(`/articles/${id}`, { params });
+  },
+  
+  getRelated: (id, params = {}) => {
+    return apiClient.get(`/articles/${id}/related`, { params });
   },
   
   like: (id) => {
@@ -48,8 +52,9 @@ export const articlesAPI = {
 
 // Comments API
 export const commentsAPI = {
-  getByArticle: (articleId) => {
-    return apiClient.get(`/articles/${articleId}/comments`);
+  // The cursor of the next page comes back in the X-Next-Cursor header
+  getByArticle: (articleId, params = {}) => {
+    return apiClient.get(`/articles/${articleId}/comments`, { params });
   },
   
   create: (articleId, commentData) => {
@@ -61,6 +66,9 @@ export const commentsAPI = {
   }
 };
 
+// Server-Sent Events stream of new comments and like counts of an article
+export const articleEventsURL = (articleId) => `${API_BASE}/articles/${articleId}/events`;
+
 // CIEL Info API
 export const cielAPI = {
   getInfo: () => {
@@ -0,0 +1,49 @@
+"""Shared fixtures: the API runs in process against an in-memory MongoDB
+
+``mongomock-motor`` stands in for Motor, so the suite needs no server; it
+checks behaviour, not query plans or latency. Install the test dependencies
+with ``pip install -r requirements-dev.txt``.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+httpx = pytest.importorskip("httpx")
+
+os.environ["MONGO_URL"] = "mongodb://localhost:27017"
+os.environ["DB_NAME"] = "ciel_blog_test"
+os.environ["READ_REPLICA_PREFERENCE"] = "primary"
+os.environ["LIKE_COUNTER_MODE"] = "direct"
+
+import motor.motor_asyncio  # noqa: E402
+
+motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import database  # noqa: E402
+
+# mongomock has no sessions
+database._transactions_supported = False
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def api():
+    """HTTP client on a freshly seeded database"""
+    import server
+    from counts import count_cache
+
+    await database.client.drop_database(os.environ["DB_NAME"])
+    await server.article_cache.invalidate()
+    count_cache.invalidate()
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
@@ -0,0 +1,226 @@
+import asyncio
+
+import orjson
+import pytest
+
+import cache
+from cache import ArticleCache, MemoryBackend, ResponseCache
+from conditional import CachedBody, content_etag
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the cache module"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def test_memory_backend_expires_entries(clock):
+    backend = MemoryBackend(max_entries=10)
+    await backend.set("a", b"1", ttl=5)
+    clock[0] += 4
+    assert await backend.get("a") == b"1"
+    clock[0] += 2
+    assert await backend.get("a") is None
+    assert len(backend) == 0
+
+
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    await backend.set("a", b"1", ttl=60)
+    await backend.set("b", b"2", ttl=60)
+    await backend.get("a")
+    await backend.set("c", b"3", ttl=60)
+    assert await backend.get("b") is None
+    assert await backend.get("a") == b"1"
+    assert await backend.get("c") == b"3"
+
+
+async def test_memory_backend_clear_by_prefix():
+    backend = MemoryBackend(max_entries=10)
+    for key in ("x:1", "x:2", "y:1"):
+        await backend.set(key, b"v", ttl=60)
+    await backend.clear("x:")
+    assert len(backend) == 1
+    assert await backend.get("y:1") == b"v"
+
+
+async def test_concurrent_misses_share_one_load():
+    responses = ResponseCache("test", MemoryBackend(10), ttl=60)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    entries = await asyncio.gather(*(responses.get_or_load("key", load) for _ in range(5)))
+    assert loads == 1
+    assert {entry.body for entry in entries} == {b"body"}
+    assert entries[0].etag == content_etag(b"body")
+    assert (await responses.get_or_load("key", load)).body == b"body"
+    assert loads == 1
+    assert responses.stats() == {"hits": 1, "misses": 5}
+
+
+async def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    responses = ResponseCache("test", MemoryBackend(10), ttl=60)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError("gone")
+
+    results = await asyncio.gather(*(responses.get_or_load("key", load) for _ in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(result, LookupError) for result in results)
+    assert await responses.get("key") is None
+
+
+async def test_load_across_an_invalidation_is_not_cached():
+    responses = ResponseCache("test", MemoryBackend(10), ttl=60)
+
+    async def load():
+        await responses.invalidate()
+        return CachedBody(b"stale", '"v1"')
+
+    assert (await responses.get_or_load("key", load)).body == b"stale"
+    assert await responses.get("key") is None
+
+
+async def test_invalidate_one_key_or_all():
+    responses = ResponseCache("test", MemoryBackend(10), ttl=60)
+    await responses.set("a", CachedBody(b"1", '"1"'))
+    await responses.set("b", CachedBody(b"2", '"2"'))
+    await responses.invalidate("a")
+    assert await responses.get("a") is None
+    assert await responses.get("b") is not None
+    await responses.invalidate()
+    assert await responses.get("b") is None
+
+
+async def test_reference_data_is_loaded_once(api, monkeypatch):
+    import server
+
+    finds = 0
+    find = server.formation_reads.find
+
+    def counting_find(*args, **kwargs):
+        nonlocal finds
+        finds += 1
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(server.formation_reads, "find", counting_find)
+    responses = await asyncio.gather(*(api.get("/api/formations") for _ in range(5)))
+    assert {response.status_code for response in responses} == {200}
+    assert len(responses[0].json()) == 3
+    assert finds == 1
+
+
+def _listing(*articles):
+    return orjson.dumps({"articles": [{"id": article_id, "likes": likes} for article_id, likes in articles]})
+
+
+async def _cache_listing(articles, key, sort, *rows):
+    await articles.set(key, CachedBody(_listing(*rows), '"l"'))
+    articles.track_listing(key, sort, (article_id for article_id, _ in rows))
+
+
+async def test_patch_updates_details_and_listings():
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=10)
+    detail = {"id": "1", "likes": 1, "comment_count": 0, "updated_at": "2025-01-01T00:00:00"}
+    await articles.set(articles.detail_key("1"), CachedBody(orjson.dumps(detail), '"d"'))
+    await _cache_listing(articles, "list:recent", "recent", ("1", 1), ("2", 5))
+    await _cache_listing(articles, "list:popular", "popular", ("2", 5), ("1", 1))
+
+    await articles.patch("1", likes=2)
+
+    patched = await articles.get(articles.detail_key("1"))
+    assert orjson.loads(patched.body)["likes"] == 2
+    assert patched.etag != '"d"'
+    listing = orjson.loads((await articles.get("list:recent")).body)
+    assert listing["articles"] == [{"id": "1", "likes": 2}, {"id": "2", "likes": 5}]
+    # Its order depends on likes: dropped, not patched
+    assert await articles.get("list:popular") is None
+    assert articles.stats()["patches"] == 1
+
+
+async def test_invalidate_listings_keeps_details():
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=10)
+    await articles.set(articles.detail_key("1"), CachedBody(b"{}", '"d"'))
+    await _cache_listing(articles, "list:recent", "recent", ("1", 1))
+    await articles.invalidate_listings()
+    assert await articles.get("list:recent") is None
+    assert await articles.get(articles.detail_key("1")) is not None
+    assert articles._listings == {}
+
+
+async def test_listing_index_is_bounded(clock):
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=2)
+    for page in range(3):
+        articles.track_listing(f"list:page={page}", "recent", [str(page)])
+    assert list(articles._tracked) == ["list:page=1", "list:page=2"]
+    assert "0" not in articles._listings
+
+    clock[0] += 61
+    articles.track_listing("list:page=3", "recent", ["3"])
+    assert list(articles._tracked) == ["list:page=3"]
+    assert set(articles._listings) == {"3"}
+
+
+async def test_new_article_shows_in_cached_listing_and_count(api):
+    listing = (await api.get("/api/articles")).json()
+    article = {"title": "Nouvel article", "content": "Un article sur la sécurité.", "author": "Test",
+               "category": "Menaces", "tags": ["IA"]}
+    await api.post("/api/articles", json=article)
+    refreshed = (await api.get("/api/articles")).json()
+    assert refreshed["total"] == listing["total"] + 1
+    assert refreshed["articles"][0]["title"] == "Nouvel article"
+
+
+async def test_like_is_patched_into_cached_listing(api):
+    import server
+
+    await api.get("/api/articles")
+    patches = server.article_cache.patches
+    await api.post("/api/articles/1/like")
+    assert server.article_cache.patches == patches + 1
+    listing = (await api.get("/api/articles")).json()
+    assert {article["id"]: article["likes"] for article in listing["articles"]}["1"] == 25
+
+
+async def _load_during_patch(articles, key, body, article_ids, sort="recent", **patch):
+    """Load ``key`` while ``patch`` is applied to article 1"""
+    async def load():
+        if key.startswith("list:"):
+            articles.track_listing(key, sort, article_ids)
+        await articles.patch("1", **patch)
+        return body
+
+    await articles.get_or_load(key, load)
+    return await articles.get(key)
+
+
+async def test_load_across_a_patch_of_another_article_is_cached():
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=10)
+    assert await _load_during_patch(articles, articles.detail_key("2"), b"{}", (), likes=3) is not None
+    listing = _listing(("2", 0), ("3", 0))
+    assert await _load_during_patch(articles, "list:recent", listing, ("2", "3"), likes=3) is not None
+
+
+async def test_load_across_a_patch_of_its_article_is_dropped():
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=10)
+    assert await _load_during_patch(articles, articles.detail_key("1", "html"), b"{}", (), likes=3) is None
+    listing = _listing(("1", 0), ("2", 0))
+    assert await _load_during_patch(articles, "list:recent", listing, ("1", "2"), likes=3) is None
+
+
+async def test_load_of_a_listing_ordered_by_the_patched_counter_is_dropped():
+    articles = ArticleCache("test", MemoryBackend(10), ttl=60, max_listings=10)
+    listing = _listing(("2", 9), ("3", 8))
+    assert await _load_during_patch(articles, "list:popular", listing, ("2", "3"), "popular", likes=3) is None
+    assert await _load_during_patch(articles, "list:pop2", listing, ("2", "3"), "popular",
+                                    comment_count=1) is not None
@@ -0,0 +1,104 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+COMMENT = {"author": "Lecteur", "content": "Merci pour l'article"}
+
+
+async def _comment_count(article_id):
+    import server
+
+    return (await server.articles_collection.find_one({"id": article_id}))["comment_count"]
+
+
+async def test_create_comment_counts_it(api):
+    await api.get("/api/articles/1")  # cached detail, patched below
+    comment = (await api.post("/api/articles/1/comments", json=COMMENT)).json()
+    assert comment["article_id"] == "1"
+    assert await _comment_count("1") == 4
+    assert (await api.get("/api/articles/1")).json()["comment_count"] == 4
+    thread = (await api.get("/api/articles/1/comments")).json()
+    assert thread[-1]["id"] == comment["id"]
+
+
+async def test_comment_on_unknown_article(api):
+    import server
+
+    assert (await api.post("/api/articles/missing/comments", json=COMMENT)).status_code == 404
+    assert await server.comments_collection.count_documents({"article_id": "missing"}) == 0
+
+
+class FailingInserts:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def insert_one(self, document, session=None):
+        raise ConnectionError("insert failed")
+
+
+async def test_failed_insert_restores_the_count(api, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "comments_collection", FailingInserts(server.comments_collection))
+    with pytest.raises(ConnectionError):
+        await api.post("/api/articles/1/comments", json=COMMENT)
+    assert await _comment_count("1") == 3
+
+
+class FakeSession:
+    """Runs the transaction callback once, like a commit on the first try"""
+
+    def __init__(self):
+        self.transactions = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def with_transaction(self, callback):
+        self.transactions += 1
+        return await callback(self)
+
+
+class SessionRecorder:
+    """Records the session of each write; mongomock has no sessions"""
+
+    def __init__(self, collection, sessions):
+        self._collection = collection
+        self._sessions = sessions
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, session=None, **kwargs):
+            self._sessions.append((self._collection.name, name, session))
+            return await method(*args, **kwargs)
+        return call
+
+
+async def test_transaction_when_supported(api, monkeypatch):
+    import server
+
+    session = FakeSession()
+    sessions = []
+
+    async def start_session():
+        return session
+
+    async def transactions_supported():
+        return True
+
+    monkeypatch.setattr(server, "transactions_supported", transactions_supported)
+    monkeypatch.setattr(server.client, "start_session", start_session)
+    for name in ("articles_collection", "comments_collection"):
+        monkeypatch.setattr(server, name, SessionRecorder(getattr(server, name), sessions))
+    assert (await api.post("/api/articles/2/comments", json=COMMENT)).status_code == 200
+    assert session.transactions == 1
+    assert sessions == [("articles", "find_one_and_update", session), ("comments", "insert_one", session)]
+    monkeypatch.undo()
+    assert await _comment_count("2") == 3
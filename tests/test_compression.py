@@ -0,0 +1,51 @@
+import pytest
+
+import compression
+from compression import is_compressible, negotiate
+
+
+def test_negotiate_gzip():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("identity") is None
+    assert negotiate("") is None
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_negotiate_prefers_brotli():
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip;q=1, br;q=0.5") == "gzip"
+    assert negotiate("*") == "br"
+    assert negotiate("br;q=0, *;q=0.1") == "gzip"
+
+
+def test_is_compressible():
+    assert is_compressible("application/json")
+    assert is_compressible("text/html; charset=utf-8")
+    assert is_compressible("application/problem+json")
+    assert not is_compressible("text/event-stream")
+    assert not is_compressible("image/png")
+
+
+@pytest.mark.anyio
+async def test_large_bodies_are_compressed_once(api):
+    import server
+
+    response = await api.get("/api/articles/1", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].startswith("W/")
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["id"] == "1"
+
+    misses = server.compressed_cache.misses
+    again = await api.get("/api/articles/1", headers={"Accept-Encoding": "gzip"})
+    assert again.content == response.content
+    assert server.compressed_cache.misses == misses
+
+
+@pytest.mark.anyio
+async def test_small_and_unaccepted_bodies_are_not_compressed(api):
+    small = await api.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    identity = await api.get("/api/articles/1", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
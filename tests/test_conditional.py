@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+from starlette.requests import Request
+
+from conditional import content_etag, is_not_modified, version_etag
+
+
+def _request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_if_none_match_compares_weakly():
+    etag = content_etag(b"body")
+    assert is_not_modified(_request(if_none_match=etag), etag)
+    assert is_not_modified(_request(if_none_match="W/" + etag), etag)
+    assert is_not_modified(_request(if_none_match=f'"other", {etag}'), etag)
+    assert is_not_modified(_request(if_none_match="*"), etag)
+    assert not is_not_modified(_request(if_none_match=version_etag(1)), etag)
+    assert not is_not_modified(_request(), etag)
+
+
+def test_if_modified_since():
+    last_modified = datetime(2025, 1, 15, 10, 0, 0, 500, tzinfo=timezone.utc)
+    assert is_not_modified(_request(if_modified_since="Wed, 15 Jan 2025 10:00:00 GMT"), '"x"', last_modified)
+    assert not is_not_modified(_request(if_modified_since="Wed, 15 Jan 2025 09:59:59 GMT"), '"x"', last_modified)
+    assert not is_not_modified(_request(if_modified_since="yesterday"), '"x"', last_modified)
+    # If-None-Match takes precedence
+    assert not is_not_modified(_request(if_none_match='"y"', if_modified_since="Wed, 15 Jan 2025 10:00:00 GMT"),
+                               '"x"', last_modified)
+
+
+@pytest.mark.anyio
+async def test_article_etag_revalidation(api):
+    response = await api.get("/api/articles/1")
+    etag = response.headers["etag"]
+    not_modified = await api.get("/api/articles/1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    await api.post("/api/articles/1/like")
+    modified = await api.get("/api/articles/1", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_listing_etag_revalidation(api):
+    etag = (await api.get("/api/articles")).headers["etag"]
+    assert (await api.get("/api/articles", headers={"If-None-Match": etag})).status_code == 304
+
+
+@pytest.mark.anyio
+async def test_comments_etag_revalidation(api):
+    etag = (await api.get("/api/articles/1/comments")).headers["etag"]
+    assert (await api.get("/api/articles/1/comments", headers={"If-None-Match": etag})).status_code == 304
+    await api.post("/api/articles/1/comments", json={"author": "Lecteur", "content": "Merci"})
+    assert (await api.get("/api/articles/1/comments", headers={"If-None-Match": etag})).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_reference_data_last_modified(api):
+    response = await api.get("/api/ciel-info")
+    assert response.headers["cache-control"] == "public, max-age=300"
+    since = response.headers["last-modified"]
+    assert (await api.get("/api/ciel-info", headers={"If-Modified-Since": since})).status_code == 304
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from counters import BufferedCounter, CoalescingCounter, DirectCounter
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingCollection:
+    """Collection wrapper counting the bulk writes"""
+
+    def __init__(self, collection, fail_writes=0):
+        self._collection = collection
+        self.bulk_writes = 0
+        self.fail_writes = fail_writes
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.bulk_writes += 1
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("primary stepped down")
+        return await self._collection.bulk_write(requests, ordered=ordered)
+
+
+@pytest.fixture
+async def collection():
+    collection = AsyncMongoMockClient()["counters"]["articles"]
+    await collection.insert_many([{"id": "a", "likes": 10}, {"id": "b", "likes": 0}])
+    return CountingCollection(collection)
+
+
+async def _likes(collection, doc_id):
+    return (await collection.find_one({"id": doc_id}))["likes"]
+
+
+async def test_direct_counter(collection):
+    counter = DirectCounter(collection)
+    assert await counter.increment("a") == 11
+    assert await counter.increment("missing") is None
+
+
+async def test_coalescing_counter_batches_a_window(collection):
+    counter = CoalescingCounter(collection, window_ms=10)
+    values = await asyncio.gather(*(counter.increment(doc_id) for doc_id in ["a"] * 5 + ["b", "missing"]))
+    assert sorted(values[:5]) == [11, 12, 13, 14, 15]
+    assert values[5:] == [1, None]
+    assert collection.bulk_writes == 1
+    assert await _likes(collection, "a") == 15
+
+
+async def test_like_endpoints(api):
+    assert (await api.post("/api/articles/1/like")).json() == {"likes": 25}
+    assert (await api.post("/api/articles/missing/like")).status_code == 404
+    comment_id = (await api.get("/api/articles/1/comments")).json()[0]["id"]
+    likes = (await api.post(f"/api/comments/{comment_id}/like")).json()["likes"]
+    assert (await api.post(f"/api/comments/{comment_id}/like")).json()["likes"] == likes + 1
+
+
+async def test_buffered_counter_flushes_aggregated_deltas(collection):
+    counter = BufferedCounter(collection, max_ops=1000)
+    for expected in range(11, 16):
+        assert await counter.increment("a") == expected
+    assert await counter.increment("missing") is None
+    assert counter.pending("a") == 5
+    assert await _likes(collection, "a") == 10
+
+    await counter.close()
+    assert counter.pending("a") == 0
+    assert collection.bulk_writes == 1
+    assert await _likes(collection, "a") == 15
+
+
+async def test_buffered_counter_keeps_deltas_of_a_failed_eager_flush(collection, caplog):
+    collection.fail_writes = 1
+    counter = BufferedCounter(collection, max_ops=2)
+    await counter.increment("a")
+    await counter.increment("a")
+    # Let the eager flush run and fail
+    await asyncio.sleep(0.01)
+    assert "Failed to flush buffered" in caplog.text
+    assert counter.pending("a") == 2
+
+    await counter.close()
+    assert await _likes(collection, "a") == 12
+
+
+async def test_buffered_likes_do_not_repeat_an_article_across_cursor_pages(api, monkeypatch):
+    import server
+
+    # Article 1 has 24 stored likes, 2 has 31 and 3 has 19
+    monkeypatch.setattr(server, "article_likes", BufferedCounter(server.articles_collection))
+    for _ in range(3):
+        await api.post("/api/articles/1/like")
+
+    first = (await api.get("/api/articles", params={"sort": "popular", "limit": 2})).json()
+    assert [(article["id"], article["likes"]) for article in first["articles"]] == [("2", 31), ("1", 27)]
+    second = (await api.get("/api/articles", params={"sort": "popular", "limit": 2,
+                                                     "cursor": first["next_cursor"]})).json()
+    assert [article["id"] for article in second["articles"]] == ["3"]
+
+
+@pytest.mark.parametrize("counter_class", [DirectCounter, CoalescingCounter, BufferedCounter])
+async def test_carried_fields_come_with_the_new_value(counter_class):
+    collection = AsyncMongoMockClient()["counters"]["comments"]
+    await collection.insert_one({"id": "c", "article_id": "a", "likes": 1})
+    counter = counter_class(collection, carried=("article_id",))
+    assert await counter.increment_document("c") == {"likes": 2, "article_id": "a"}
+    if isinstance(counter, BufferedCounter):
+        await counter.flush()
+    assert await counter.increment_document("c") == {"likes": 3, "article_id": "a"}
+    assert await counter.increment_document("missing") is None
+    await counter.close()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient, WebSocketDenialResponse
+
+
+def _sse_data(message: bytes) -> dict:
+    return json.loads(message.split(b"data: ", 1)[1])
+
+
+@pytest.mark.anyio
+async def test_events_stream(api):
+    import server
+
+    response = await server.article_events("1")
+    events = response.body_iterator
+    assert await events.__anext__() == b": connected\n\n"
+
+    await api.post("/api/articles/1/comments", json={"author": "Lecteur", "content": "Merci"})
+    message = await events.__anext__()
+    assert message.startswith(b"event: comment\n")
+    comment = _sse_data(message)
+    assert (comment["comment"]["content"], comment["comment_count"]) == ("Merci", 4)
+
+    comment_id = comment["comment"]["id"]
+    await api.post("/api/articles/1/like")
+    await api.post(f"/api/comments/{comment_id}/like")
+    await server.event_hub.flush_likes()
+    message = await events.__anext__()
+    assert message.startswith(b"event: likes\n")
+    likes = _sse_data(message)
+    assert (likes["likes"], likes["comments"]) == (25, {comment_id: 1})
+
+    await events.aclose()
+    assert server.event_hub._subscribers == {}
+
+
+@pytest.mark.anyio
+async def test_events_of_unknown_article(api):
+    assert (await api.get("/api/articles/missing/events")).status_code == 404
+
+
+def test_websocket_events(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.event_hub, "like_interval", 0.01)
+    with TestClient(server.app) as client:
+        with client.websocket_connect("/api/articles/1/ws") as socket:
+            likes = client.post("/api/articles/1/like").json()["likes"]
+            event = socket.receive_json()
+    assert (event["type"], event["article_id"], event["likes"]) == ("likes", "1", likes)
+
+
+def test_websocket_of_unknown_article():
+    import server
+
+    with TestClient(server.app) as client:
+        with pytest.raises(WebSocketDenialResponse) as denial:
+            with client.websocket_connect("/api/articles/missing/ws"):
+                pass
+    assert denial.value.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_comment_like_reaches_subscribers_without_another_read(api, monkeypatch):
+    import server
+
+    comment_id = (await api.get("/api/articles/1/comments")).json()[0]["id"]
+    monkeypatch.setattr(server.event_hub.broker, "remote", True)
+
+    reads = 0
+    find_one = server.comments_collection.find_one
+
+    async def counting_find_one(*args, **kwargs):
+        nonlocal reads
+        reads += 1
+        return await find_one(*args, **kwargs)
+
+    monkeypatch.setattr(server.comments_collection, "find_one", counting_find_one)
+    likes = (await api.post(f"/api/comments/{comment_id}/like")).json()["likes"]
+    assert reads == 0
+    assert server.event_hub._likes["1"]["comments"] == {comment_id: likes}
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_export_articles(api):
+    response = await api.get("/api/export/articles", params={"batch_size": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    documents = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(document["id"] for document in documents) == ["1", "2", "3"]
+    assert all("_id" not in document for document in documents)
+    updated = [document["updated_at"] for document in documents]
+    assert updated == sorted(updated)
+
+
+async def test_export_since(api):
+    article = {"title": "Nouveau", "content": "Texte.", "author": "Test", "category": "Menaces", "tags": []}
+    created = (await api.post("/api/articles", json=article)).json()
+    response = await api.get("/api/export/articles", params={"since": created["updated_at"]})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [created["id"]]
+
+
+async def test_export_gzip(api):
+    response = await api.get("/api/export/articles", params={"gzip": "true"})
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx decodes the body
+    assert len(response.text.splitlines()) == 3
+
+
+async def test_export_comments(api):
+    response = await api.get("/api/export/comments", params={"batch_size": 4})
+    comments = [json.loads(line) for line in response.text.splitlines()]
+    assert len(comments) == 6
+    published = [comment["published_at"] for comment in comments]
+    assert published == sorted(published)
@@ -0,0 +1,37 @@
+from collections import Counter
+
+import pytest
+
+from facets import sorted_counts
+
+pytestmark = pytest.mark.anyio
+
+
+def test_sorted_counts_orders_by_count_then_value():
+    counts = sorted_counts({"category": Counter({"b": 1, "a": 1, "c": 3}), "tag": Counter()})
+    assert counts == {"category": [{"value": "c", "count": 3}, {"value": "a", "count": 1},
+                                   {"value": "b", "count": 1}], "tag": []}
+
+
+async def test_facets(api):
+    facets = (await api.get("/api/facets")).json()
+    assert facets["total"] == 3
+    assert {facet["value"] for facet in facets["categories"]} == {"Menaces", "Architecture", "Cryptographie"}
+
+    by_category = (await api.get("/api/facets", params={"category": "Architecture"})).json()
+    assert by_category["total"] == 1
+    assert by_category["categories"] == [{"value": "Architecture", "count": 1}]
+
+    by_search = (await api.get("/api/facets", params={"search": "zero trust"})).json()
+    assert by_search["categories"] == [{"value": "Architecture", "count": 1}]
+
+
+async def test_facets_count_new_articles_once_per_tag(api):
+    article = {"title": "Nouveau", "content": "Texte.", "author": "Test", "category": "Menaces",
+               "tags": ["IA", "IA", "Nouveau"]}
+    await api.post("/api/articles", json=article)
+    facets = (await api.get("/api/facets")).json()
+    tags = {facet["value"]: facet["count"] for facet in facets["tags"]}
+    assert tags["Nouveau"] == 1
+    assert tags["IA"] == 2
+    assert {"value": "Menaces", "count": 2} in facets["categories"]
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from render import is_rendered
+
+pytestmark = pytest.mark.anyio
+
+
+def _new_article(title, category="Menaces", tags=("Ransomware",)):
+    return {"title": title, "content": f"# {title}\n\nUn article sur le ransomware et la sécurité réseau.",
+            "author": "Test", "category": category, "tags": list(tags)}
+
+
+async def test_bulk_ingest_json_array(api):
+    body = [_new_article("Ransomware en hausse"), {"title": "incomplet"}, _new_article("Rançons payées")]
+    response = await api.post("/api/articles/bulk", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["index"] == 1
+
+    listing = (await api.get("/api/articles", params={"category": "Menaces"})).json()
+    assert listing["total"] == 3
+    search = (await api.get("/api/articles", params={"search": "ransomware hausse"})).json()
+    assert [article["title"] for article in search["articles"]] == ["Ransomware en hausse"]
+
+
+async def test_bulk_ingest_ndjson(api):
+    lines = [json.dumps(_new_article(f"Article {n}")) for n in range(3)] + ["{not json"]
+    response = await api.post("/api/articles/bulk", content="\n".join(lines).encode(),
+                              headers={"Content-Type": "application/x-ndjson"})
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (3, 1)
+    assert result["errors"][0]["index"] == 3
+
+
+async def test_bulk_ingest_rejects_a_non_array(api):
+    response = await api.post("/api/articles/bulk", json={"title": "seul"})
+    assert response.status_code == 400
+
+
+async def test_bulk_ingest_indexes_every_article(api):
+    body = [_new_article(f"Ingestion {n}", category="Forensique", tags=["Ingestion"]) for n in range(5)]
+    assert (await api.post("/api/articles/bulk", json=body)).json()["inserted"] == 5
+    assert (await api.get("/api/articles", params={"search": "ingestion"})).json()["total"] == 5
+    facets = (await api.get("/api/facets")).json()
+    assert {"value": "Forensique", "count": 5} in facets["categories"]
+    listing = (await api.get("/api/articles", params={"category": "Forensique", "limit": 1})).json()
+    article_id = listing["articles"][0]["id"]
+    assert (await api.get(f"/api/articles/{article_id}/related")).status_code == 200
+
+
+async def test_ingested_articles_are_rendered_on_first_read(api):
+    import server
+
+    assert (await api.post("/api/articles/bulk", json=[_new_article("Rendu différé")])).json()["inserted"] == 1
+    stored = await server.articles_collection.find_one({"title": "Rendu différé"})
+    assert "content_html" not in stored
+    article = (await api.get(f"/api/articles/{stored['id']}", params={"format": "html"})).json()
+    assert article["toc"][0]["name"] == "Rendu différé"
+    assert is_rendered(await server.articles_collection.find_one({"id": stored["id"]}))
+
+
+async def test_ingested_articles_get_related_articles_at_the_next_sync(api):
+    import server
+
+    body = [_new_article(f"Rançongiciel {n}", tags=["Rançongiciel"]) for n in range(2)]
+    assert (await api.post("/api/articles/bulk", json=body)).json()["inserted"] == 2
+    article_id = (await server.articles_collection.find_one({"title": "Rançongiciel 0"}))["id"]
+    assert (await api.get(f"/api/articles/{article_id}/related")).json() == []
+    await server.related_index.sync(server.articles_collection)
+    related = (await api.get(f"/api/articles/{article_id}/related")).json()
+    assert related[0]["title"] == "Rançongiciel 1"
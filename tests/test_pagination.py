@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+
+@pytest.mark.parametrize("kind, value", [
+    ("recent", datetime(2025, 1, 15, 10, 0)),
+    ("popular", 42),
+    ("read_time", 0),
+    ("relevance", 3.25),
+    ("trending", [12, -0.5]),
+])
+def test_cursor_round_trip(kind, value):
+    cursor = encode_cursor(kind, value, "article-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, kind) == (value, "article-1")
+
+
+def test_cursor_of_another_sort_is_rejected():
+    cursor = encode_cursor("popular", 3, "a")
+    with pytest.raises(InvalidCursor, match="sort=recent"):
+        decode_cursor(cursor, "recent")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm90IGpzb24", encode_cursor("recent", 1, "a")[:-4]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "recent")
+
+
+@pytest.mark.parametrize("kind, value", [
+    ("recent", 5),
+    ("popular", "5"),
+    ("popular", True),
+    ("comments", 1.5),
+    ("relevance", {"$gt": 0}),
+    ("trending", [1]),
+    ("trending", [1, float("inf")]),
+])
+def test_forged_cursor_value_is_rejected(kind, value):
+    with pytest.raises(InvalidCursor, match="Malformed"):
+        decode_cursor(encode_cursor(kind, value, "a"), kind)
+
+
+def test_cursor_item_id_must_be_a_string():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("popular", 1, 7), "popular")
+
+
+def test_keyset_filter_descending():
+    assert keyset_filter("likes", -1, 10, "b") == {
+        "likes": {"$lte": 10},
+        "$or": [{"likes": {"$lt": 10}}, {"id": {"$lt": "b"}}],
+    }
+
+
+@pytest.mark.anyio
+async def test_listing_cursor_pages(api):
+    first = (await api.get("/api/articles", params={"limit": 2, "sort": "popular"})).json()
+    assert first["next_cursor"]
+    second = (await api.get("/api/articles", params={"limit": 2, "sort": "popular",
+                                                     "cursor": first["next_cursor"]})).json()
+    pages = first["articles"] + second["articles"]
+    assert sorted(article["id"] for article in pages) == ["1", "2", "3"]
+    likes = [article["likes"] for article in pages]
+    assert likes == sorted(likes, reverse=True)
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor("popular", 3, "1")])
+async def test_listing_rejects_a_bad_cursor(api, cursor):
+    response = await api.get("/api/articles", params={"sort": "recent", "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,36 @@
+import pytest
+
+from reading import make_excerpt, reading_minutes, word_count
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", 0),
+    ("un", 1),
+    ("  deux   mots  ", 2),
+    ("Sécurité réseau: l'attaque, encore.", 5),
+    ("ligne\nsuivante\tet fin", 4),
+])
+def test_word_count(text, expected):
+    assert word_count(text) == expected
+
+
+def test_reading_minutes_is_at_least_one():
+    assert reading_minutes(0) == 1
+    assert reading_minutes(10_000) > reading_minutes(1_000)
+
+
+def test_excerpt_is_plain_text_cut_at_a_word():
+    content = "# Titre\n\nUn **premier** paragraphe avec un [lien](https://example.org).\n\n" + "mot " * 100
+    excerpt = make_excerpt(content, length=60)
+    assert excerpt.startswith("Un premier paragraphe avec un lien.")
+    assert len(excerpt) <= 61
+    assert not excerpt.rstrip("…").endswith(" ")
+
+
+@pytest.mark.anyio
+async def test_created_article_gets_its_reading_stats(api):
+    article = {"title": "Long", "content": "mot " * 1000, "author": "Test", "category": "Menaces", "tags": []}
+    created = (await api.post("/api/articles", json=article)).json()
+    assert created["word_count"] == 1000
+    assert created["read_time"] == f"{created['reading_minutes']} min"
+    assert created["excerpt"].startswith("mot mot")
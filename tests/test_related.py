@@ -0,0 +1,61 @@
+import pytest
+
+import related
+from related import RelatedIndex
+
+
+def _article(article_id, title, tags=()):
+    return {"id": article_id, "title": title, "excerpt": "", "content": "", "tags": list(tags)}
+
+
+def test_related_by_text_and_tags():
+    index = RelatedIndex(top_k=2)
+    index._build([
+        _article("ransom", "Ransomware chiffrement rançon", ["Ransomware"]),
+        _article("ransom2", "Ransomware rançon payée", ["Ransomware"]),
+        _article("trust", "Zero Trust réseau", ["Réseaux"]),
+        _article("vpn", "VPN et réseau d'entreprise", ["Réseaux"]),
+    ])
+    assert index.related("ransom", 1) == ["ransom2"]
+    assert index.related("trust", 1) == ["vpn"]
+    assert index.related("missing", 3) == []
+
+
+def test_new_article_joins_its_neighbours_tables():
+    index = RelatedIndex(top_k=1)
+    index._build([_article("a", "Phishing par courriel"), _article("b", "Cryptographie quantique")])
+    assert index.related("a", 1) == []
+    index.add_many([_article("c", "Phishing ciblé par courriel", ["Phishing"])])
+    assert index.related("c", 1) == ["a"]
+    assert index.related("a", 1) == ["c"]
+    assert len(index) == 3
+    # Already indexed: ignored
+    index.add(_article("c", "Autre titre"))
+    assert len(index) == 3
+
+
+def test_common_tags_only_reach_their_latest_articles(monkeypatch):
+    monkeypatch.setattr(related, "RELATED_TAG_ROWS", 3)
+    index = RelatedIndex(top_k=5)
+    index._build([
+        _article("old", "Pare-feu applicatif", ["Réseaux", "Web"]),
+        _article("older", "Cryptographie quantique", ["Réseaux"]),
+        _article("recent", "Annuaire LDAP", ["Réseaux"]),
+        _article("latest", "Supervision SIEM", ["Réseaux"]),
+    ])
+    index.add(_article("new", "Pare-feu réseau", ["Réseaux", "Web"]))
+    neighbours = index.related("new", 5)
+    # Beyond the latest three of "Réseaux" (the new article included), found
+    # through the text only, with every shared tag counted
+    assert neighbours[0] == "old"
+    assert "older" not in neighbours
+    assert {"recent", "latest"} <= set(neighbours)
+
+
+@pytest.mark.anyio
+async def test_related_articles(api):
+    related = (await api.get("/api/articles/1/related", params={"limit": 2})).json()
+    assert 0 < len(related) <= 2
+    assert "1" not in {article["id"] for article in related}
+    assert "content" not in related[0]
+    assert (await api.get("/api/articles/missing/related")).status_code == 404
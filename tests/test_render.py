@@ -0,0 +1,41 @@
+import pytest
+
+from render import is_rendered, render_article
+
+
+def test_render_article():
+    rendered = render_article("# Sécurité IA\n\n## Menaces\n\nTexte <script>alert(1)</script>\n\n```python\nx = 1\n```")
+    html = rendered["content_html"]
+    assert '<h1 id="sécurité-ia">' in html
+    assert "<script" not in html
+    assert '<code class="language-python">' in html
+    assert rendered["toc"][0]["name"] == "Sécurité IA"
+    assert rendered["toc"][0]["children"][0]["id"] == "menaces"
+
+
+def test_is_rendered_tracks_the_content():
+    article = {"content": "# Titre", **render_article("# Titre")}
+    assert is_rendered(article)
+    article["content"] = "# Autre titre"
+    assert not is_rendered(article)
+
+
+@pytest.mark.anyio
+async def test_article_html_format(api):
+    article = (await api.get("/api/articles/1", params={"format": "html"})).json()
+    assert "content" not in article
+    assert "<h2" in article["content_html"]
+    assert article["toc"]
+    assert "content_html" not in (await api.get("/api/articles/1")).json()
+    assert (await api.get("/api/articles/1", params={"format": "pdf"})).status_code == 422
+
+
+@pytest.mark.anyio
+async def test_stale_rendering_is_replaced_on_read(api):
+    import server
+
+    await server.articles_collection.update_one({"id": "2"}, {"$set": {"content": "# Nouveau contenu"}})
+    article = (await api.get("/api/articles/2", params={"format": "html"})).json()
+    assert article["toc"][0]["name"] == "Nouveau contenu"
+    stored = await server.articles_collection.find_one({"id": "2"})
+    assert is_rendered(stored)
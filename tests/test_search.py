@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from search import SearchIndex, fold, stem, tokenize
+
+
+def test_fold_strips_accents_and_ligatures():
+    assert fold("Sécurité Œuvre Ça") == "securite oeuvre ca"
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("reseaux", "reseau"),
+    ("securite", "secur"),
+    ("chiffrement", "chiffr"),
+    ("attaques", "attaqu"),
+    ("2025", "2025"),
+    ("ia", "ia"),
+])
+def test_stem(token, expected):
+    assert stem(token) == expected
+
+
+def test_tokenize_drops_stop_words_and_stems():
+    assert tokenize("Les attaques sur les réseaux") == ["attaqu", "reseau"]
+
+
+def test_tokenize_matches_inflected_forms():
+    assert tokenize("Sécurité") == tokenize("securites")
+
+
+def _article(article_id, title, category="Menaces", tags=(), reading_minutes=5):
+    return {"id": article_id, "title": title, "excerpt": "", "content": "", "category": category,
+            "tags": list(tags), "reading_minutes": reading_minutes, "updated_at": datetime(2025, 1, 1)}
+
+
+def test_index_match_rank_and_facets():
+    index = SearchIndex()
+    index.add(_article("1", "Ransomware et réseaux", tags=["Ransomware"]))
+    index.add(_article("2", "Ransomware ransomware", category="Architecture", tags=["Ransomware", "IA"],
+                       reading_minutes=12))
+    index.add(_article("3", "Zero Trust", category="Architecture"))
+
+    assert sorted(index.match("ransomware")) == ["1", "2"]
+    assert index.match("ransomware", category="Menaces") == ["1"]
+    assert index.match("ransomware", max_read_time=10) == ["1"]
+
+    total, hits = index.rank("ransomware")
+    assert total == 2
+    assert [doc_id for _, doc_id in hits] == ["2", "1"]
+
+    facets = index.facets(index.match("ransomware"))
+    assert facets["category"] == {"Menaces": 1, "Architecture": 1}
+    assert facets["tag"] == {"Ransomware": 2, "IA": 1}
+
+    index.remove("2")
+    assert index.match("ransomware") == ["1"]
+    assert len(index) == 2
+
+
+@pytest.mark.anyio
+async def test_listing_search(api):
+    listing = (await api.get("/api/articles", params={"search": "réseau zero trust"})).json()
+    assert [article["id"] for article in listing["articles"]] == ["2"]
+    assert listing["total"] == 1
+
+    ranked = (await api.get("/api/articles", params={"search": "sécurité", "sort": "relevance"})).json()
+    assert ranked["total"] == len(ranked["articles"]) > 1
+
+    nothing = (await api.get("/api/articles", params={"search": "introuvable"})).json()
+    assert (nothing["articles"], nothing["total"]) == ([], 0)
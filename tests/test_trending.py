@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import encode_cursor
+from trending import TrendingIndex
+
+
+def _article(article_id, hours_ago, category="Menaces"):
+    return {"id": article_id, "category": category, "published_at": datetime.utcnow() - timedelta(hours=hours_ago)}
+
+
+def test_newer_and_busier_articles_rank_first():
+    index = TrendingIndex(half_life_hours=24)
+    index.add(_article("old", 48))
+    index.add(_article("new", 1))
+    index.add(_article("other", 2, category="Architecture"))
+    assert [article_id for _, article_id in index.page(None, 10)[1]] == ["new", "other", "old"]
+
+    for _ in range(40):
+        index.liked("old")
+    total, hits = index.page(None, 10)
+    assert total == 3
+    assert hits[0][1] == "old"
+    assert [article_id for _, article_id in index.page("Menaces", 10)[1]] == ["old", "new"]
+
+
+def test_page_after_a_cursor_and_within_a_set():
+    index = TrendingIndex()
+    for hours_ago, article_id in enumerate("abcd"):
+        index.add(_article(article_id, hours_ago))
+    _, first = index.page(None, 2)
+    _, second = index.page(None, 2, after=first[-1])
+    assert [article_id for _, article_id in first + second] == list("abcd")
+    assert index.page(None, 10, only={"b", "d"}) == (2, [hit for hit in first + second if hit[1] in "bd"])
+
+
+@pytest.mark.anyio
+async def test_trending_listing(api):
+    first = (await api.get("/api/articles", params={"sort": "trending", "limit": 2})).json()
+    second = (await api.get("/api/articles", params={"sort": "trending", "limit": 2,
+                                                     "cursor": first["next_cursor"]})).json()
+    assert sorted(article["id"] for article in first["articles"] + second["articles"]) == ["1", "2", "3"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("value", [[1, "x"], [1, float("inf")], [1, 2, 3], 5])
+async def test_trending_listing_rejects_a_forged_cursor(api, value):
+    cursor = encode_cursor("trending", value, "1")
+    assert (await api.get("/api/articles", params={"sort": "trending", "cursor": cursor})).status_code == 400
+
+
+@pytest.mark.anyio
+async def test_trending_cursor_from_a_far_epoch(api):
+    cursor = encode_cursor("trending", [1e308, -1e308], "missing")
+    assert (await api.get("/api/articles", params={"sort": "trending", "cursor": cursor})).status_code == 200